@@ -0,0 +1,642 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+from TicketsWD import (TICKET_COLUMNS, TICKET_PERIODS, TICKET_PRICES, TicketTableModel,
+                       migrate_database, build_filter, prepare_query)
+
+# Tyle wierszy pobiera stronicowany model tabeli przy pierwszym wyświetleniu
+FIRST_FETCH = TicketTableModel.PAGE_SIZE
+# Domyślne liczby biletów: pełny zestaw pomiarów oraz sam pomiar filtrów (--schema)
+SUITE_ROWS = [10_000, 100_000, 1_000_000]
+SCHEMA_ROWS = [10_000, 1_000_000, 5_000_000]
+
+# Aplikacje objęte pomiarami; każda mierzona w osobnym procesie, bo okno zadań
+# używa PyQt6, a pozostałe PyQt5
+APPS = ["tickets", "tasks", "plots"]
+TASK_PRIORITIES = ["Niski", "Średni", "Wysoki"]
+PLOT_TYPES = ["Liniowy", "Punktowy", "Słupkowy", "Histogram"]
+# Wykres słupkowy rysuje osobny prostokąt na punkt, więc powyżej tej liczby jest pomijany
+MAX_BAR_POINTS = 2000
+# Moduł, biblioteka Qt i kod tworzący główne okno każdej aplikacji, jak w jej bloku __main__
+STARTUP_WINDOWS = {
+    "tickets": ("TicketsWD", "PyQt5", "store = app_module.TicketStore()\n"
+                                      "app_module.createConnection(store)\n"
+                                      "window = app_module.Tickets(store)"),
+    "tasks": ("TodoListWD", "PyQt6", "app_module.darkMode(app)\n"
+                                     "window = app_module.TaskManager()"),
+    "plots": ("GraphsWD", "PyQt5", "window = app_module.MainWindow()"),
+}
+# Skrypt uruchamiany w świeżym interpreterze, bo BenchmarkWD sam importuje TicketsWD i PyQt5
+STARTUP_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+import {module} as app_module
+imported = time.perf_counter()
+from {binding}.QtCore import QObject, QEvent
+from {binding}.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+{create}
+painted = []
+
+class PaintFilter(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and not painted:
+            painted.append(time.perf_counter())
+        return False
+
+paint_filter = PaintFilter()
+window.installEventFilter(paint_filter)
+window.show()
+while not painted:
+    app.processEvents()
+print(json.dumps(dict(import_ms=(imported - started) * 1000, first_window_ms=(painted[0] - imported) * 1000,
+                      painted_at=time.time())))
+window.close()
+"""
+
+
+def fill_tickets(db, rows, seed=0, batch_size=50000):
+    """Wypełnia tabelę biletów syntetycznymi danymi"""
+    rnd = random.Random(seed)
+    types = list(TICKET_PERIODS.keys())
+    start = date.today() - timedelta(days=5 * 365)
+    query = QSqlQuery(db)
+    query.prepare(f"""
+        INSERT INTO tickets ({', '.join(TICKET_COLUMNS)})
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """)
+    for offset in range(0, rows, batch_size):
+        columns = [[] for _ in TICKET_COLUMNS]
+        for n in range(offset, min(rows, offset + batch_size)):
+            ticket_type = rnd.choice(types)
+            discount_type = rnd.choice(["Normalny", "Ulgowy"])
+            valid_from = start + timedelta(days=rnd.randrange(5 * 365 + 30))
+            valid_to = valid_from + timedelta(days=TICKET_PERIODS[ticket_type])
+            record = (f"{n:016d}", f"Klient {n}", ticket_type, discount_type,
+                      valid_from.isoformat(), valid_to.isoformat(),
+                      TICKET_PRICES[ticket_type][discount_type])
+            for column, value in zip(columns, record):
+                column.append(value)
+        db.transaction()
+        for column in columns:
+            query.addBindValue(column)
+        if not query.execBatch():
+            db.rollback()
+            raise RuntimeError(query.lastError().text())
+        db.commit()
+
+
+def filter_cases():
+    """Zwraca kombinacje filtrów dostępnych w oknie biletów"""
+    today = date.today().isoformat()
+    return {
+        "brak": build_filter(),
+        "typ": build_filter("Roczny"),
+        "typ+rodzaj": build_filter("Roczny", "Ulgowy"),
+        "ważne dzisiaj": build_filter(valid_on=today),
+        "typ+rodzaj+ważne": build_filter("Miesięczny", "Ulgowy", today),
+        "szukaj": build_filter(search="Klient 12"),
+    }
+
+
+def median_ms(func, repeat, setup=None):
+    """Zwraca medianę czasu wykonania funkcji w milisekundach (bez czasu setup)"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def time_filter(db, where, params, repeat):
+    """Mierzy czas pobrania pierwszej strony i policzenia wierszy dla filtra"""
+    where_sql = f" WHERE {where}" if where else ""
+
+    def first_page():
+        query = prepare_query(db, f"SELECT {', '.join(TICKET_COLUMNS)} FROM tickets{where_sql}", params)
+        query.setForwardOnly(True)
+        query.exec_()
+        fetched = 0
+        while fetched < FIRST_FETCH and query.next():
+            fetched += 1
+
+    def count():
+        query = prepare_query(db, f"SELECT COUNT(*) FROM tickets{where_sql}", params)
+        query.exec_()
+        query.next()
+
+    return median_ms(first_page, repeat), median_ms(count, repeat)
+
+
+def bench_tickets_filters(rows, schema, repeat):
+    """Uruchamia pomiar filtrów dla podanej liczby wierszy"""
+    with tempfile.TemporaryDirectory() as tmp:
+        name = f"bench-{rows}"
+        db = QSqlDatabase.addDatabase("QSQLITE", name)
+        db.setDatabaseName(os.path.join(tmp, "tickets.sqlite"))
+        db.open()
+        migrate_database(db, target_version=1)
+        fill_tickets(db, rows)
+        # Indeksy budowane po wstawieniu danych, tak jak przy migracji istniejącej bazy
+        migrate_database(db, target_version=schema)
+        results = {case: time_filter(db, where, params, repeat)
+                   for case, (where, params) in filter_cases().items()}
+        db.close()
+        del db
+        QSqlDatabase.removeDatabase(name)
+    return results
+
+
+def bench_tickets(rows, repeat, seed):
+    """Mierzy filtry modelu tabeli, eksport CSV i wydawanie biletów; zwraca wyniki"""
+    from TicketsWD import TicketStore, CsvExportWorker
+
+    results = []
+    scale = {"rows": rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TicketStore(os.path.join(tmp, "tickets.sqlite"))
+        db = store.connection()
+        migrate_database(db, target_version=1)
+        fill_tickets(db, rows, seed)
+        store.migrate()
+
+        for case, (where, params) in filter_cases().items():
+            page_ms, count_ms = time_filter(db, where, params, repeat)
+            results.append(result("tickets", f"filter/{case}", scale, "first_page_ms", page_ms))
+            results.append(result("tickets", f"filter/{case}", scale, "count_ms", count_ms))
+
+            # Ten sam filtr w modelu tabeli: liczba wierszy i pierwsza strona
+            def model_filter():
+                model = TicketTableModel(db)
+                model.set_filter([("tickets", where, params)])
+                model.record(0)
+            results.append(result("tickets", f"model/{case}", scale, "ms", median_ms(model_filter, repeat)))
+
+        export_name = os.path.join(tmp, "export.csv")
+        worker = CsvExportWorker(store, export_name)
+        export_ms = median_ms(lambda: worker.export(db), repeat)
+        results.append(result("tickets", "export", scale, "ms", export_ms))
+        results.append(result("tickets", "export", scale, "rows_per_s", rows / export_ms * 1000 if export_ms else 0))
+
+        today = date.today().isoformat()
+        results.append(result("tickets", "insert/single", scale, "ms", median_ms(
+            lambda: store.add_ticket("Klient testowy", "Miesięczny", "Normalny", today), repeat)))
+        batch = [("Klient testowy", "Miesięczny", "Normalny", today)] * 1000
+        results.append(result("tickets", "insert/batch-1000", scale, "ms", median_ms(
+            lambda: store.issue_tickets(batch), repeat)))
+        store.close_connection()
+    return results
+
+
+def write_tasks(file_name, count, seed):
+    """Zapisuje plik zadań w formacie tekst|priorytet"""
+    rnd = random.Random(seed)
+    with open(file_name, "w", encoding="utf-8") as file:
+        for n in range(count):
+            file.write(f"Zadanie {n}|{rnd.choice(TASK_PRIORITIES)}\n")
+
+
+def bench_tasks(count, repeat, seed):
+    """Mierzy wczytanie, filtrowanie i zapis listy zadań; zwraca wyniki"""
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QEventLoop, QItemSelection, QItemSelectionModel
+    from TodoListWD import TaskManager
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = []
+    scale = {"tasks": count}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # TaskManager czyta i zapisuje tasks.txt w katalogu bieżącym
+        os.chdir(tmp)
+        try:
+            write_tasks("tasks.txt", count, seed)
+            windows = []
+
+            # Okno pokazuje się od razu, a zadania wczytuje wątek; czekamy na koniec
+            def load():
+                window = TaskManager()
+                window.show()
+                if window.loadMs is None:
+                    loop = QEventLoop()
+                    window.loadFinished.connect(loop.quit)
+                    loop.exec()
+                windows.append(window)
+            results.append(result("tasks", "load", scale, "ms", median_ms(load, repeat)))
+            results.append(result("tasks", "first_paint", scale, "ms",
+                                  sorted(w.firstPaintMs for w in windows)[len(windows) // 2]))
+            window = windows[-1]
+            for old in windows[:-1]:
+                old.close()
+                old.deleteLater()
+            app.processEvents()
+
+            for priority in ["Wszystkie"] + TASK_PRIORITIES:
+                def apply_filter():
+                    window.filterInput.setCurrentText(priority)
+                    window.filterTasks()
+                    app.processEvents()
+                results.append(result("tasks", f"filter/{priority}", scale, "ms",
+                                      median_ms(apply_filter, repeat)))
+            window.filterInput.setCurrentText("Wszystkie")
+
+            # Wpisywanie frazy znak po znaku, jak w polu wyszukiwania
+            for query in ["Zadanie 1", "Zadanie 12345"]:
+                def search():
+                    window.searchInput.clear()
+                    for end in range(1, len(query) + 1):
+                        window.searchInput.setText(query[:end])
+                        app.processEvents()
+                results.append(result("tasks", f"search/{query}", scale, "ms",
+                                      median_ms(search, repeat)))
+            window.searchInput.clear()
+
+            # Dodanie zadania razem z dopisaniem operacji do dziennika
+            def add():
+                window.taskInput.setText("Nowe zadanie")
+                window.addTask()
+                window.storage.flush()
+            results.append(result("tasks", "add", scale, "ms", median_ms(add, repeat)))
+            results.append(result("tasks", "save", scale, "ms", median_ms(window.saveTasks, repeat)))
+
+            # Operacje zbiorcze na co dziesiątym zadaniu: jedna operacja modelu i jeden zapis dziennika
+            def select_every_tenth():
+                model = window.filterModel
+                selection = QItemSelection()
+                for row in range(0, model.rowCount(), 10):
+                    selection.select(model.index(row), model.index(row))
+                window.taskList.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+            def bulk_priority():
+                rows = window.selectedRows()
+                window.taskModel.setPriorities(rows, 2)
+                window.storage.record({"op": "priority", "rows": rows, "priority": TASK_PRIORITIES[2]})
+                window.storage.flush()
+
+            def bulk_delete():
+                window.deleteTask()
+                window.storage.flush()
+            results.append(result("tasks", "bulk_priority", scale, "ms",
+                                  median_ms(bulk_priority, repeat, select_every_tenth)))
+            results.append(result("tasks", "bulk_delete", scale, "ms",
+                                  median_ms(bulk_delete, repeat, select_every_tenth)))
+
+            # Przełączenie trybu sortowania i dodawanie zadań we wstawianiu binarnym
+            for mode in (1, 2):
+                def sort_view():
+                    window.sortInput.setCurrentIndex(mode)
+                    app.processEvents()
+                results.append(result("tasks", f"sort/{mode}", scale, "ms",
+                                      median_ms(sort_view, repeat, lambda: window.sortInput.setCurrentIndex(0))))
+                results.append(result("tasks", f"add_sorted/{mode}", scale, "ms", median_ms(add, repeat)))
+            window.sortInput.setCurrentIndex(0)
+            window.close()
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def make_dataset(points, seed):
+    """Zwraca ramkę danych z dwiema kolumnami jak z pliku CSV bez nagłówka"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, 1000, points))
+    return pd.DataFrame({0: x, 1: 0.5 * x + rng.normal(0, 50, points)})
+
+
+def bench_plots(points, datasets, repeat, seed):
+    """Mierzy wczytanie plików, czas update_plot dla typów wykresu i regresji; zwraca wyniki"""
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QEventLoop
+    from GraphsWD import PlotTab, DataLoader, LinearFit, Histogram
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = []
+    scale = {"points": points, "datasets": datasets}
+    colors = ['red', 'blue', 'green', 'orange', 'purple']
+    tab = PlotTab()
+    tab.resize(1000, 800)
+    tab.show()
+    app.processEvents()
+    for i in range(datasets):
+        tab.data_sets[f"zbior{i}.csv"] = {'data': make_dataset(points, seed + i), 'color': colors[i % len(colors)]}
+
+    # Wczytanie plików CSV w wątkach: bez pamięci podręcznej .npy i z nią
+    with tempfile.TemporaryDirectory() as tmp:
+        filenames = []
+        for i, dataset in enumerate(tab.data_sets.values()):
+            filenames.append(os.path.join(tmp, f"zbior{i}.csv"))
+            dataset['data'].to_csv(filenames[-1], header=False, index=False)
+
+        def load():
+            loader = DataLoader(filenames)
+            loop = QEventLoop()
+            loader.finished.connect(loop.quit)
+            loader.start()
+            loop.exec_()
+            loader.wait()
+
+        def remove_cache():
+            for name in os.listdir(tmp):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(tmp, name))
+        results.append(result("plots", "load/csv", scale, "ms", median_ms(load, repeat, remove_cache)))
+        results.append(result("plots", "load/cache", scale, "ms", median_ms(load, repeat)))
+
+    for regression in (False, True):
+        tab.regression_check.blockSignals(True)
+        tab.regression_check.setChecked(regression)
+        tab.regression_check.blockSignals(False)
+        for plot_type in PLOT_TYPES:
+            if regression and plot_type not in ("Liniowy", "Punktowy"):
+                continue
+            if plot_type == "Słupkowy" and points > MAX_BAR_POINTS:
+                continue
+            tab.plot_type.blockSignals(True)
+            tab.plot_type.setCurrentText(plot_type)
+            tab.plot_type.blockSignals(False)
+
+            # Pełna przebudowa wszystkich artystów, jak przy zmianie typu wykresu
+            def render():
+                tab.rebuild_plot()
+                app.processEvents()
+            case = f"update_plot/{plot_type}" + ("+regresja" if regression else "")
+            results.append(result("plots", case, scale, "ms", median_ms(render, repeat)))
+
+    # Zmiany przyrostowe na wykresie liniowym: tekst, linie regresji, jeden nowy zbiór
+    tab.regression_check.setChecked(False)
+    tab.plot_type.setCurrentText("Liniowy")
+    app.processEvents()
+
+    def edit_title():
+        tab.title_edit.setText("Pomiar" if tab.title_edit.text() != "Pomiar" else "Pomiar 2")
+        app.processEvents()
+
+    def toggle_regression():
+        tab.regression_check.setChecked(not tab.regression_check.isChecked())
+        app.processEvents()
+
+    def remove_added():
+        tab.data_sets.pop("nowy.csv", None)
+        tab.update_plot()
+        app.processEvents()
+
+    def add_dataset():
+        tab.data_sets["nowy.csv"] = {'data': make_dataset(points, seed + datasets), 'color': 'black'}
+        tab.update_plot()
+        app.processEvents()
+    results.append(result("plots", "title", scale, "ms", median_ms(edit_title, repeat)))
+    toggle_regression()
+    results.append(result("plots", "regression_toggle", scale, "ms", median_ms(toggle_regression, repeat)))
+    results.append(result("plots", "add_dataset", scale, "ms", median_ms(add_dataset, repeat, remove_added)))
+
+    # Regresja z momentów: dopasowanie wszystkich zbiorów od zera i dopisanie 1000 punktów do jednego
+    columns = [(dataset['data'][0].values, dataset['data'][1].values) for dataset in tab.data_sets.values()]
+    results.append(result("plots", "regression/fit", scale, "ms",
+                          median_ms(lambda: [LinearFit(x, y) for x, y in columns], repeat)))
+    fit = LinearFit(*columns[0])
+    results.append(result("plots", "regression/append_1000", scale, "ms",
+                          median_ms(lambda: fit.append(columns[0][0][:1000], columns[0][1][:1000]), repeat)))
+
+    # Histogramy we wspólnych przedziałach: zliczenie wszystkich zbiorów i zmiana liczby przedziałów
+    def count_histograms():
+        for x, y in columns:
+            Histogram(-200.0, 700.0).add(y)
+    results.append(result("plots", "histogram/count", scale, "ms", median_ms(count_histograms, repeat)))
+    tab.plot_type.setCurrentText("Histogram")
+    app.processEvents()
+
+    def rebin():
+        tab.bins_input.setCurrentIndex((tab.bins_input.currentIndex() + 1) % tab.bins_input.count())
+        app.processEvents()
+    results.append(result("plots", "histogram/rebin", scale, "ms", median_ms(rebin, repeat)))
+    tab.cleanup()
+    tab.close()
+    return results
+
+
+def slowest_imports(report, module, count=5):
+    """Zwraca moduły importowane bezpośrednio przez moduł aplikacji z raportu -X importtime"""
+    imports, pending = [], []
+    # Raport wypisuje moduł po jego zależnościach; wcięcie o dwie spacje oznacza poziom niżej
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") and not name.startswith("    "):
+            pending.append((int(cumulative) / 1000, name.strip()))
+        elif name.startswith(" ") and not name.startswith("  "):
+            if name.strip() == module:
+                imports = pending
+            pending = []
+    return sorted(imports, reverse=True)[:count]
+
+
+def measure_startup(app_name, import_time=False):
+    """Uruchamia aplikację w nowym procesie do pierwszego narysowania okna; zwraca czasy w ms"""
+    module, binding, create = STARTUP_WINDOWS[app_name]
+    script = STARTUP_SCRIPT.format(module=module, binding=binding, create=create)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                     env.get("PYTHONPATH")]))
+    command = [sys.executable] + (["-X", "importtime"] if import_time else []) + ["-c", script]
+    # Katalog tymczasowy, żeby okna utworzyły puste pliki danych zamiast czytać bieżące
+    with tempfile.TemporaryDirectory() as tmp:
+        launched = time.time()
+        output = subprocess.run(command, capture_output=True, text=True, cwd=tmp, env=env)
+    if output.returncode != 0:
+        sys.stderr.write(output.stderr)
+        raise SystemExit(f"Start aplikacji {app_name} nie powiódł się")
+    timings = json.loads(output.stdout.splitlines()[-1])
+    timings["process_ms"] = (timings.pop("painted_at") - launched) * 1000
+    if import_time:
+        timings["imports"] = slowest_imports(output.stderr, module)
+    return timings
+
+
+def bench_startup(app_name, repeat):
+    """Mierzy import modułu, czas do pierwszego okna i cały zimny start aplikacji; zwraca wyniki"""
+    runs = [measure_startup(app_name) for _ in range(repeat)]
+    results = []
+    for metric in ("import_ms", "first_window_ms", "process_ms"):
+        values = sorted(run[metric] for run in runs)
+        results.append(result(app_name, "startup", {}, metric, values[len(values) // 2]))
+    return results
+
+
+def result(app, case, scale, metric, value):
+    """Zwraca jeden wynik pomiaru w formacie zapisywanym do JSON"""
+    return {"app": app, "case": case, "scale": scale, "metric": metric, "value": round(value, 4)}
+
+
+def result_key(item):
+    """Zwraca klucz wyniku pozwalający dopasować pomiary z dwóch uruchomień"""
+    scale = ",".join(f"{name}={value}" for name, value in sorted(item["scale"].items()))
+    return item["app"], item["case"], scale, item["metric"]
+
+
+def git_commit():
+    """Zwraca skrót bieżącego commita lub None poza repozytorium"""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run_app(app_name, args):
+    """Uruchamia pomiary jednej aplikacji w bieżącym procesie i zwraca wyniki"""
+    results = []
+    if app_name == "tickets":
+        QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+        for rows in args.rows:
+            results.extend(bench_tickets(rows, args.repeat, args.seed))
+    elif app_name == "tasks":
+        for count in args.tasks:
+            results.extend(bench_tasks(count, args.repeat, args.seed))
+    elif app_name == "plots":
+        for points in args.points:
+            for datasets in args.datasets:
+                results.extend(bench_plots(points, datasets, args.repeat, args.seed))
+    return results
+
+
+def scale_arguments(args):
+    """Zwraca argumenty skali i powtórzeń do przekazania procesowi potomnemu"""
+    options = ["--repeat", str(args.repeat), "--seed", str(args.seed)]
+    for name in ("rows", "tasks", "points", "datasets"):
+        options += [f"--{name}"] + [str(value) for value in getattr(args, name)]
+    return options
+
+
+def compare(baseline_name, current_name, threshold):
+    """Wypisuje zmiany wyników względem poprzedniego pliku; zwraca liczbę regresji"""
+    with open(baseline_name, encoding="utf-8") as file:
+        baseline = {result_key(item): item["value"] for item in json.load(file)["results"]}
+    with open(current_name, encoding="utf-8") as file:
+        current = json.load(file)["results"]
+    regressions = 0
+    print(f"{'aplikacja':<8} {'przypadek':<32} {'skala':<24} {'metryka':<12} {'przed':>10} {'po':>10} {'zmiana':>8}")
+    for item in current:
+        key = result_key(item)
+        if key not in baseline:
+            continue
+        before, after = baseline[key], item["value"]
+        change = (after - before) / before * 100 if before else 0.0
+        # Dla przepustowości większa wartość jest lepsza, dla czasów mniejsza
+        worse = -change if item["metric"].endswith("_per_s") else change
+        marker = " !" if worse > threshold else ""
+        regressions += bool(marker)
+        print(f"{key[0]:<8} {key[1]:<32} {key[2]:<24} {key[3]:<12} {before:10.2f} {after:10.2f} {change:+7.1f}%{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pomiary wydajności aplikacji biletów, zadań i wykresów")
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS)
+    parser.add_argument("--rows", type=int, nargs="+",
+                        help=f"liczby biletów (domyślnie {SUITE_ROWS}, z --schema {SCHEMA_ROWS})")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="liczby zadań")
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="liczby punktów na zbiór danych")
+    parser.add_argument("--datasets", type=int, nargs="+", default=[1, 5], help="liczby zbiorów danych")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="plik wyników JSON (domyślnie standardowe wyjście)")
+    parser.add_argument("--compare", metavar="BASELINE", help="porównuje wyniki z poprzednim plikiem JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="próg regresji w procentach")
+    parser.add_argument("--schema", type=int, help="tylko pomiar filtrów biletów dla wersji schematu "
+                                                  "(1 = bez indeksów), wynik jako tabela")
+    parser.add_argument("--startup", action="store_true",
+                        help="tylko profil startu aplikacji: import, pierwsze okno, najwolniejsze importy")
+    parser.add_argument("--app-process", choices=APPS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.rows is None:
+        args.rows = SCHEMA_ROWS if args.schema is not None else SUITE_ROWS
+
+    if args.schema is not None:
+        app = QCoreApplication(sys.argv)
+        print(f"schemat v{args.schema}, mediana z {args.repeat} powtórzeń [ms]")
+        print(f"{'wiersze':>10} {'filtr':<20} {'1. strona':>10} {'COUNT(*)':>10}")
+        for rows in args.rows:
+            results = bench_tickets_filters(rows, args.schema, args.repeat)
+            for case, (page_ms, count_ms) in results.items():
+                print(f"{rows:>10} {case:<20} {page_ms:10.2f} {count_ms:10.2f}")
+        return 0
+
+    if args.startup:
+        print(f"mediana z {args.repeat} uruchomień [ms]")
+        print(f"{'aplikacja':<8} {'import':>10} {'1. okno':>10} {'proces':>10}  najwolniejsze importy")
+        for app_name in args.apps:
+            timings = {item["metric"]: item["value"] for item in bench_startup(app_name, args.repeat)}
+            imports = measure_startup(app_name, import_time=True)["imports"]
+            print(f"{app_name:<8} {timings['import_ms']:10.1f} {timings['first_window_ms']:10.1f} "
+                  f"{timings['process_ms']:10.1f}  "
+                  + ", ".join(f"{name} {ms:.0f}" for ms, name in imports))
+        return 0
+
+    if args.app_process:
+        # Proces potomny: wyniki jednej aplikacji jako JSON na standardowe wyjście
+        json.dump(run_app(args.app_process, args), sys.stdout, ensure_ascii=False)
+        return 0
+
+    results = []
+    for app_name in args.apps:
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--app-process", app_name]
+                                + scale_arguments(args), capture_output=True, text=True)
+        if output.returncode != 0:
+            sys.stderr.write(output.stderr)
+            raise SystemExit(f"Pomiar aplikacji {app_name} nie powiódł się")
+        results.extend(json.loads(output.stdout))
+        results.extend(bench_startup(app_name, args.repeat))
+        print(f"{app_name}: {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt_platform": os.environ["QT_QPA_PLATFORM"],
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.compare:
+        if not args.output:
+            raise SystemExit("Porównanie wymaga zapisania wyników opcją --output")
+        return 1 if compare(args.compare, args.output, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
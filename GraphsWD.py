@@ -1,17 +1,249 @@
+import os
+import re
 import sys
-import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QComboBox, QFileDialog, 
-                            QLineEdit, QLabel, QTabWidget, QCheckBox, QMessageBox)
+                            QLineEdit, QLabel, QTabWidget, QCheckBox, QMessageBox,
+                            QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView, QInputDialog)
+from PyQt5.QtCore import QThread, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
-from scipy.stats import linregress
+
+# pandas jest importowany dopiero przy pierwszym wczytaniu danych, bo wydłuża start okna
+
+# Piramida min/max: poziom k dzieli punkty na kubełki po 2**(k+1) i pamięta indeksy
+# minimum i maksimum każdego kubełka, więc szczyty zostają widoczne po zmniejszeniu liczby punktów
+class DecimationPyramid:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.sorted = len(x) < 2 or bool(np.all(x[1:] >= x[:-1]))
+        low = high = y
+        if np.isnan(y).any():
+            low = np.where(np.isnan(y), np.inf, y)
+            high = np.where(np.isnan(y), -np.inf, y)
+        self.mins = []
+        self.maxs = []
+        if len(y) < 2:
+            return
+        mins = self.first_level(low, np.less)
+        maxs = self.first_level(high, np.greater)
+        self.mins.append(mins)
+        self.maxs.append(maxs)
+        while len(mins) > 1:
+            mins = self.merge_pairs(low, mins, np.less)
+            maxs = self.merge_pairs(high, maxs, np.greater)
+            self.mins.append(mins)
+            self.maxs.append(maxs)
+
+    @staticmethod
+    def first_level(values, better):
+        size = len(values)
+        merged = np.arange(0, size - 1, 2, dtype=np.int32 if size < 2**31 else np.int64)
+        merged += better(values[1::2], values[0:size - 1:2])
+        if size % 2:
+            merged = np.append(merged, size - 1)
+        return merged
+
+    @staticmethod
+    def merge_pairs(values, index, better):
+        first = index[0:len(index) - 1:2]
+        second = index[1::2]
+        merged = np.where(better(values[second], values[first]), second, first)
+        if len(index) % 2:
+            merged = np.append(merged, index[-1])
+        return merged
+
+    def select(self, x_min, x_max, width):
+        start, stop = 0, len(self.x)
+        if self.sorted:
+            start = max(int(np.searchsorted(self.x, x_min, 'left')) - 1, 0)
+            stop = min(int(np.searchsorted(self.x, x_max, 'right')) + 1, stop)
+        buckets = max(int(width), 1)
+        if stop - start <= 2 * buckets or not self.mins:
+            return self.x[start:stop], self.y[start:stop]
+        level = 0
+        while level < len(self.mins) - 1 and (stop - start) >> (level + 1) > buckets:
+            level += 1
+        size = 2 ** (level + 1)
+        mins = self.mins[level][start // size:-(-stop // size)]
+        maxs = self.maxs[level][start // size:-(-stop // size)]
+        index = np.empty(2 * len(mins), dtype=mins.dtype)
+        index[0::2] = np.minimum(mins, maxs)
+        index[1::2] = np.maximum(mins, maxs)
+        return self.x[index], self.y[index]
+
+# Regresja liniowa z sum momentów (średnie, sumy kwadratów odchyleń i iloczynów odchyleń);
+# dopisanie k punktów scala ich momenty z dotychczasowymi w O(k), jak w algorytmie Chana
+class LinearFit:
+    def __init__(self, x=None, y=None):
+        self.count = 0
+        self.mean_x = self.mean_y = 0.0
+        self.ss_x = self.ss_y = self.ss_xy = 0.0
+        self.x_min, self.x_max = np.inf, -np.inf
+        if x is not None:
+            self.append(x, y)
+
+    def append(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if np.isnan(x).any() or np.isnan(y).any():
+            finite = ~(np.isnan(x) | np.isnan(y))
+            x, y = x[finite], y[finite]
+        count = len(x)
+        if not count:
+            return
+        mean_x, mean_y = x.mean(), y.mean()
+        dx, dy = x - mean_x, y - mean_y
+        total = self.count + count
+        delta_x, delta_y = mean_x - self.mean_x, mean_y - self.mean_y
+        weight = self.count * count / total
+        self.ss_x += dx @ dx + delta_x * delta_x * weight
+        self.ss_y += dy @ dy + delta_y * delta_y * weight
+        self.ss_xy += dx @ dy + delta_x * delta_y * weight
+        self.mean_x += delta_x * count / total
+        self.mean_y += delta_y * count / total
+        self.count = total
+        self.x_min = min(self.x_min, x.min())
+        self.x_max = max(self.x_max, x.max())
+
+    def result(self):
+        if self.count < 2 or self.ss_x == 0:
+            raise ValueError("Nie można wyznaczyć regresji, gdy wszystkie wartości x są równe")
+        slope = self.ss_xy / self.ss_x
+        intercept = self.mean_y - slope * self.mean_x
+        r_squared = self.ss_xy ** 2 / (self.ss_x * self.ss_y) if self.ss_y else 0.0
+        return slope, intercept, r_squared
+
+# Liczności w BASE_BINS równych przedziałach wspólnego zakresu; każda liczba przedziałów z HISTOGRAM_BINS
+# dzieli BASE_BINS, więc zmiana liczby przedziałów tylko scala sąsiednie liczności bez ponownego zliczania
+class Histogram:
+    BASE_BINS = 1280
+    HISTOGRAM_BINS = [10, 20, 40, 80, 160, 320, 640, 1280]
+
+    def __init__(self, low, high):
+        self.key = (low, high)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        self.range = (low, high)
+        self.counts = np.zeros(self.BASE_BINS, dtype=np.int64)
+
+    def add(self, values):
+        self.counts += np.histogram(values, bins=self.BASE_BINS, range=self.range)[0]
+
+    def merged(self, bins):
+        factor = self.BASE_BINS // bins
+        edges = np.linspace(self.range[0], self.range[1], bins + 1)
+        return edges, self.counts.reshape(bins, factor).sum(axis=1)
+
+# Wczytuje pliki równolegle w puli wątków; kolumny zapisuje obok pliku w ukrytym pliku .npy,
+# którego nazwa zawiera rozmiar, czas modyfikacji i typ danych, a przy ponownym wczytaniu mapuje go do pamięci
+class DataLoader(QThread):
+    CHUNK_ROWS = 1_000_000
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, filenames, dtype=np.float64, parent=None):
+        super().__init__(parent)
+        self.filenames = filenames
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.rows_lock = threading.Lock()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        workers = max(1, min(len(self.filenames), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.load_file, filename): filename for filename in self.filenames}
+            for future in as_completed(futures):
+                try:
+                    df = future.result()
+                except Exception as e:
+                    self.failed.emit(futures[future], str(e))
+                else:
+                    if df is not None:
+                        self.loaded.emit(futures[future], df)
+
+    def cache_name(self, filename, stat):
+        directory, base = os.path.split(os.path.abspath(filename))
+        return os.path.join(directory, f".{base}.{stat.st_size}-{stat.st_mtime_ns}.{self.dtype.name}.npy")
+
+    def load_file(self, filename):
+        cache_name = self.cache_name(filename, os.stat(filename))
+        if os.path.exists(cache_name):
+            try:
+                columns = np.load(cache_name, mmap_mode='r')
+            except (OSError, ValueError):
+                columns = None
+            if columns is not None:
+                self.add_rows(columns.shape[1])
+                return self.frame(columns)
+
+        import pandas as pd
+        chunks = []
+        with pd.read_csv(filename, header=None, dtype=self.dtype, chunksize=self.CHUNK_ROWS) as reader:
+            for chunk in reader:
+                if self.cancelled:
+                    return None
+                chunks.append(chunk.to_numpy().T)
+                self.add_rows(len(chunk))
+        columns = np.concatenate(chunks, axis=1)
+        self.write_cache(filename, cache_name, columns)
+        return self.frame(columns)
+
+    def add_rows(self, count):
+        with self.rows_lock:
+            self.rows += count
+            rows = self.rows
+        self.progress.emit(rows)
+
+    def write_cache(self, filename, cache_name, columns):
+        directory, name = os.path.split(cache_name)
+        # Starsze wersje tego samego pliku w tej samej precyzji; cache innego dtype zostaje
+        stale = re.compile(re.escape(f".{os.path.basename(filename)}.") + r"\d+-\d+"
+                           + re.escape(f".{self.dtype.name}.npy"))
+        temp_name = f"{cache_name}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            with open(temp_name, 'wb') as file:
+                np.save(file, columns)
+            os.replace(temp_name, cache_name)
+        except OSError:
+            try:
+                os.remove(temp_name)
+            except OSError:
+                pass
+            return
+        try:
+            for other in os.listdir(directory):
+                if stale.fullmatch(other) and other != name:
+                    os.remove(os.path.join(directory, other))
+        except OSError:
+            pass
+
+    def frame(self, columns):
+        import pandas as pd
+        return pd.DataFrame({i: column for i, column in enumerate(columns)}, copy=False)
 
 class PlotTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.data_sets = {}
+        self.artists = {}
+        self.drawn_type = None
+        self.background = None
+        self.background_has_fits = False
+        self.axes_image = None
+        self.drawing_labels = False
+        self.loader = None
         self.init_ui()
         
     def init_ui(self):
@@ -23,15 +255,32 @@ class PlotTab(QWidget):
         self.load_button.clicked.connect(self.load_data)
         control_layout.addWidget(self.load_button)
         
+        self.append_button = QPushButton("Dołącz dane")
+        self.append_button.clicked.connect(self.append_files)
+        control_layout.addWidget(self.append_button)
+        
         self.plot_type = QComboBox()
         self.plot_type.addItems(["Liniowy", "Punktowy", "Słupkowy", "Histogram"])
         self.plot_type.currentIndexChanged.connect(self.update_plot)
         control_layout.addWidget(self.plot_type)
         
         self.regression_check = QCheckBox("Regresja liniowa")
-        self.regression_check.stateChanged.connect(self.update_plot)
+        self.regression_check.stateChanged.connect(self.toggle_regression)
         control_layout.addWidget(self.regression_check)
         
+        self.bins_input = QComboBox()
+        self.bins_input.addItems([f"{bins} przedziałów" for bins in Histogram.HISTOGRAM_BINS])
+        self.bins_input.setCurrentIndex(Histogram.HISTOGRAM_BINS.index(20))
+        self.bins_input.currentIndexChanged.connect(self.update_plot)
+        control_layout.addWidget(self.bins_input)
+        
+        self.full_resolution_check = QCheckBox("Pełna rozdzielczość")
+        self.full_resolution_check.stateChanged.connect(self.redecimate)
+        control_layout.addWidget(self.full_resolution_check)
+        
+        self.float32_check = QCheckBox("Dane jako float32")
+        control_layout.addWidget(self.float32_check)
+        
         layout.addLayout(control_layout)
         
         self.title_edit = QLineEdit()
@@ -41,75 +290,303 @@ class PlotTab(QWidget):
         self.y_label = QLineEdit()
         self.y_label.setPlaceholderText("Etykieta osi Y")
         
-        layout.addWidget(self.title_edit)
-        layout.addWidget(self.x_label)
-        layout.addWidget(self.y_label)
+        for edit in (self.title_edit, self.x_label, self.y_label):
+            edit.textChanged.connect(self.update_labels)
+            layout.addWidget(edit)
         
         self.figure = Figure()
+        self.ax = self.figure.add_subplot(111)
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self.redecimate())
         self.canvas = FigureCanvas(self.figure)
+        self.canvas.mpl_connect('resize_event', lambda event: self.redecimate())
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
         
+        self.load_progress = QProgressBar()
+        self.load_progress.setFormat("%v/%m plików")
+        self.load_progress.hide()
+        layout.addWidget(self.load_progress)
+        
         self.stats_label = QLabel()
         layout.addWidget(self.stats_label)
         
+        self.regression_table = QTableWidget(0, 4)
+        self.regression_table.setHorizontalHeaderLabels(["Zbiór danych", "Nachylenie", "Wyraz wolny", "R²"])
+        self.regression_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.regression_table.verticalHeader().hide()
+        self.regression_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.regression_table.setMaximumHeight(150)
+        # Ukryta tabela zachowuje miejsce, żeby przełączenie regresji nie zmieniało rozmiaru wykresu
+        size_policy = self.regression_table.sizePolicy()
+        size_policy.setRetainSizeWhenHidden(True)
+        self.regression_table.setSizePolicy(size_policy)
+        self.regression_table.hide()
+        layout.addWidget(self.regression_table)
+        
     def load_data(self):
         filenames, _ = QFileDialog.getOpenFileNames(self, "Wybierz pliki", "", 
                                                   "Pliki tekstowe (*.txt *.csv)")
         if filenames:
-            colors = ['red', 'blue', 'green', 'orange', 'purple']
-            for i, filename in enumerate(filenames):
-                try:
-                    df = pd.read_csv(filename, header=None)
-                    self.data_sets[filename] = {
-                        'data': df,
-                        'color': colors[i % len(colors)]
-                    }
-                except Exception as e:
-                    QMessageBox.critical(self, "Błąd", f"Nie można wczytać pliku {filename}: {e}")
-            self.update_plot()
+            self.start_loading(filenames)
+    
+    def append_files(self):
+        if not self.data_sets:
+            QMessageBox.warning(self, "Błąd", "Najpierw wczytaj dane")
+            return
+        name, ok = QInputDialog.getItem(self, "Dołącz dane", "Zbiór danych:", list(self.data_sets), 0, False)
+        if not ok:
+            return
+        filenames, _ = QFileDialog.getOpenFileNames(self, "Wybierz pliki", "", 
+                                                  "Pliki tekstowe (*.txt *.csv)")
+        if filenames:
+            self.start_loading(filenames, target=name)
+    
+    def start_loading(self, filenames, target=None):
+        self.load_button.setEnabled(False)
+        self.append_button.setEnabled(False)
+        self.load_target = target
+        self.load_order = filenames
+        self.loaded_sets = {}
+        self.load_progress.setRange(0, len(filenames))
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        dtype = np.float32 if self.float32_check.isChecked() else np.float64
+        self.loader = DataLoader(filenames, dtype, self)
+        self.loader.progress.connect(lambda rows: self.stats_label.setText(f"Wczytano wierszy: {rows}"))
+        self.loader.loaded.connect(self.on_file_loaded)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loader.finished.connect(self.on_load_finished)
+        self.loader.start()
+    
+    def on_file_loaded(self, filename, df):
+        self.loaded_sets[filename] = df
+        self.load_progress.setValue(self.load_progress.value() + 1)
+    
+    def on_load_failed(self, filename, message):
+        self.load_progress.setValue(self.load_progress.value() + 1)
+        QMessageBox.critical(self, "Błąd", f"Nie można wczytać pliku {filename}: {message}")
+    
+    def on_load_finished(self):
+        self.loader.deleteLater()
+        self.loader = None
+        self.load_progress.hide()
+        self.load_button.setEnabled(True)
+        self.append_button.setEnabled(True)
+        colors = ['red', 'blue', 'green', 'orange', 'purple']
+        for i, filename in enumerate(self.load_order):
+            if filename not in self.loaded_sets:
+                continue
+            if self.load_target is not None:
+                if self.load_target in self.data_sets:
+                    self.append_data(self.load_target, self.loaded_sets[filename])
+            else:
+                self.data_sets[filename] = {
+                    'data': self.loaded_sets[filename],
+                    'color': colors[i % len(colors)]
+                }
+        self.loaded_sets = {}
+        self.update_plot()
+    
+    # Dopisane wiersze aktualizują zapisane momenty regresji i liczności histogramu w O(k)
+    def append_data(self, name, df):
+        import pandas as pd
+        dataset = self.data_sets[name]
+        if 'regression' in dataset:
+            dataset['regression'].append(df[0].values, df[1].values)
+        if 'value_range' in dataset and np.isfinite(df[1].values).any():
+            low, high = dataset['value_range']
+            dataset['value_range'] = (min(low, np.nanmin(df[1].values)), max(high, np.nanmax(df[1].values)))
+        if 'histogram' in dataset:
+            dataset['histogram'].add(df[1].values)
+        dataset['data'] = pd.concat([dataset['data'], df], ignore_index=True)
+        dataset.pop('pyramid', None)
     
     def update_plot(self):
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        self.stats_label.clear()
-        
         plot_type = self.plot_type.currentText()
-        
+        if plot_type != self.drawn_type:
+            self.remove_artists(list(self.artists))
+            self.ax.set_autoscale_on(True)
+            self.drawn_type = plot_type
+        histogram_key = self.histogram_key() if plot_type == "Histogram" else None
+        self.remove_artists([name for name, drawn in self.artists.items()
+                             if self.data_sets.get(name) is not drawn['dataset']
+                             or drawn['dataset']['data'] is not drawn['data']
+                             or drawn['histogram'] != histogram_key])
         for name, dataset in self.data_sets.items():
-            df = dataset['data']
-            color = dataset['color']
-            
-            if plot_type == "Liniowy":
-                ax.plot(df[0], df[1], color=color, label=name)
-            elif plot_type == "Punktowy":
-                ax.scatter(df[0], df[1], color=color, label=name)
-            elif plot_type == "Słupkowy":
-                ax.bar(df[0], df[1], color=color, label=name)
-            elif plot_type == "Histogram":
-                ax.hist(df[1], bins=20, color=color, alpha=0.5, label=name)
-                
-            if self.regression_check.isChecked() and plot_type in ["Liniowy", "Punktowy"]:
-                x = df[0].values
-                y = df[1].values
-                try:
-                    slope, intercept, r_value, p_value, std_err = linregress(x, y)
-                    ax.plot(x, slope*x + intercept, color='black', linestyle='--')
-                    self.stats_label.setText(
-                        f"Regresja: y = {slope:.2f}x + {intercept:.2f}\n"
-                        f"R² = {r_value**2:.2f}"
-                    )
-                except Exception as e:
-                    QMessageBox.warning(self, "Błąd regresji", str(e))
-        
-        ax.set_title(self.title_edit.text())
-        ax.set_xlabel(self.x_label.text())
-        ax.set_ylabel(self.y_label.text())
-        if len(self.data_sets) > 1:
-            ax.legend()
-            
-        self.canvas.draw()
+            if name not in self.artists:
+                self.artists[name] = self.add_artist(name, dataset, plot_type, histogram_key)
+        self.artists = {name: self.artists[name] for name in self.data_sets}
+        if len(self.artists) > 1:
+            self.ax.legend(handles=[drawn['artist'] for drawn in self.artists.values()])
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self.update_regression()
+        # Autoskalowanie osi przed rysowaniem, żeby przerzedzenie po zmianie zakresu nie zlecało drugiego
+        self.ax.get_xlim()
+        self.canvas.draw_idle()
+    
+    def rebuild_plot(self):
+        self.remove_artists(list(self.artists))
+        self.update_plot()
+    
+    def histogram_key(self):
+        low, high = np.inf, -np.inf
+        for dataset in self.data_sets.values():
+            if 'value_range' not in dataset:
+                values = dataset['data'][1].values
+                dataset['value_range'] = ((np.nanmin(values), np.nanmax(values))
+                                          if np.isfinite(values).any() else (np.inf, -np.inf))
+            low = min(low, dataset['value_range'][0])
+            high = max(high, dataset['value_range'][1])
+        if low > high:
+            low, high = 0.0, 1.0
+        return low, high, Histogram.HISTOGRAM_BINS[self.bins_input.currentIndex()]
+    
+    def dataset_histogram(self, dataset, low, high):
+        histogram = dataset.get('histogram')
+        if histogram is None or histogram.key != (low, high):
+            histogram = dataset['histogram'] = Histogram(low, high)
+            histogram.add(dataset['data'][1].values)
+        return histogram
+    
+    def add_artist(self, name, dataset, plot_type, histogram_key=None):
+        df = dataset['data']
+        color = dataset['color']
+        drawn = {'dataset': dataset, 'data': df, 'fit': None, 'full': self.full_resolution_check.isChecked(),
+                 'histogram': histogram_key}
+        if plot_type == "Liniowy":
+            drawn['artist'], = self.ax.plot(*self.visible_points(dataset), color=color, label=name)
+        elif plot_type == "Punktowy":
+            drawn['artist'] = self.ax.scatter(*self.visible_points(dataset), color=color, label=name)
+        elif plot_type == "Słupkowy":
+            drawn['artist'] = self.ax.bar(df[0], df[1], color=color, label=name)
+        elif plot_type == "Histogram":
+            low, high, bins = histogram_key
+            edges, counts = self.dataset_histogram(dataset, low, high).merged(bins)
+            drawn['artist'] = self.ax.stairs(counts, edges, fill=True, color=color, alpha=0.5, label=name)
+        return drawn
+    
+    def remove_artists(self, names):
+        for name in names:
+            drawn = self.artists.pop(name)
+            drawn['artist'].remove()
+            if drawn['fit'] is not None:
+                drawn['fit'].remove()
+        if names:
+            self.ax.relim(visible_only=True)
+            for drawn in self.artists.values():
+                if hasattr(drawn['artist'], 'get_offsets'):
+                    self.ax.update_datalim(drawn['artist'].get_offsets())
+    
+    def visible_points(self, dataset, x_min=-np.inf, x_max=np.inf):
+        df = dataset['data']
+        if self.full_resolution_check.isChecked():
+            return df[0].values, df[1].values
+        if 'pyramid' not in dataset:
+            dataset['pyramid'] = DecimationPyramid(df[0].values, df[1].values)
+        return dataset['pyramid'].select(x_min, x_max, self.ax.bbox.width)
+    
+    def update_regression(self):
+        show = self.regression_check.isChecked() and self.drawn_type in ["Liniowy", "Punktowy"]
+        rows = []
+        for name, drawn in self.artists.items():
+            if not show:
+                if drawn['fit'] is not None:
+                    drawn['fit'].set_visible(False)
+                continue
+            dataset = drawn['dataset']
+            computed = 'regression' not in dataset
+            if computed:
+                dataset['regression'] = LinearFit(dataset['data'][0].values, dataset['data'][1].values)
+            try:
+                slope, intercept, r_squared = dataset['regression'].result()
+            except ValueError as e:
+                if computed:
+                    QMessageBox.warning(self, "Błąd regresji", f"{name}: {e}")
+                rows.append((name, None))
+                continue
+            if drawn['fit'] is None:
+                fit = dataset['regression']
+                ends = np.array([fit.x_min, fit.x_max])
+                drawn['fit'], = self.ax.plot(ends, slope*ends + intercept, color='black', linestyle='--',
+                                             scalex=False, scaley=False)
+            drawn['fit'].set_visible(True)
+            rows.append((name, (slope, intercept, r_squared)))
+        self.regression_table.setRowCount(len(rows))
+        for row, (name, values) in enumerate(rows):
+            if values is None:
+                cells = [name, "-", "-", "-"]
+            else:
+                cells = [name, f"{values[0]:.4g}", f"{values[1]:.4g}", f"{values[2]:.4f}"]
+            for column, text in enumerate(cells):
+                self.regression_table.setItem(row, column, QTableWidgetItem(text))
+        self.regression_table.setVisible(show)
+    
+    def toggle_regression(self):
+        self.update_regression()
+        # Tło osi zapamiętane bez linii regresji pozwala je pokazać lub ukryć bez przerysowania zbiorów
+        if self.background is None or self.background_has_fits:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        for drawn in self.artists.values():
+            if drawn['fit'] is not None and drawn['fit'].get_visible():
+                self.ax.draw_artist(drawn['fit'])
+        self.canvas.blit(self.ax.bbox)
+        self.axes_image = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.figure.stale = False
+    
+    def on_draw(self, event):
+        if self.drawing_labels:
+            return
+        self.background = self.axes_image = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.background_has_fits = any(drawn['fit'] is not None and drawn['fit'].get_visible()
+                                       for drawn in self.artists.values())
+    
+    def update_labels(self):
+        current = self.axes_image is not None and not self.figure.stale
+        self.ax.set_title(self.title_edit.text())
+        self.ax.set_xlabel(self.x_label.text())
+        self.ax.set_ylabel(self.y_label.text())
+        if not current:
+            self.canvas.draw_idle()
+            return
+        # Napisy leżą poza polem osi: rysujemy figurę bez danych, a pole osi odtwarzamy z ostatniego obrazu
+        data_artists = self.ax.lines + self.ax.collections + self.ax.patches
+        for artist in data_artists:
+            artist.set_animated(True)
+        self.drawing_labels = True
+        try:
+            self.canvas.draw()
+        finally:
+            self.drawing_labels = False
+            for artist in data_artists:
+                artist.set_animated(False)
+        self.canvas.restore_region(self.axes_image)
+        self.canvas.blit(self.figure.bbox)
+    
+    def redecimate(self):
+        if self.drawn_type not in ["Liniowy", "Punktowy"] or not self.artists:
+            return
+        x_min, x_max = self.ax.get_xlim()
+        full = self.full_resolution_check.isChecked()
+        for drawn in self.artists.values():
+            if full and drawn['full']:
+                continue
+            drawn['full'] = full
+            x_values, y_values = self.visible_points(drawn['dataset'], x_min, x_max)
+            if hasattr(drawn['artist'], 'set_data'):
+                drawn['artist'].set_data(x_values, y_values)
+            else:
+                drawn['artist'].set_offsets(np.column_stack([x_values, y_values]))
+        self.canvas.draw_idle()
     
     def cleanup(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader.wait()
         self.figure.clf()
         self.canvas.close()
 
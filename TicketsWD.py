@@ -1,33 +1,1468 @@
+import os
 import sys
 import csv
-from datetime import datetime, timedelta
-import random
-from PyQt5.QtSql import QSqlDatabase, QSqlQuery, QSqlTableModel
+import gzip
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QMessageBox, 
                             QTableView, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLineEdit, QLabel, QFormLayout,
-                            QComboBox, QDateEdit, QFileDialog)
-from PyQt5.QtCore import Qt, QDate
+                            QComboBox, QDateEdit, QFileDialog, QHeaderView,
+                            QProgressDialog, QGroupBox, QTableWidget,
+                            QTableWidgetItem, QCheckBox, QInputDialog)
+from PyQt5.QtCore import (Qt, QDate, QAbstractTableModel, QModelIndex, QThread,
+                          QTimer, QCoreApplication, pyqtSignal)
+
+TICKET_PERIODS = {
+    "Miesięczny": 30,
+    "90-dniowy": 90,
+    "Półroczny": 182,
+    "Roczny": 365
+}
+
+TICKET_PRICES = {
+    "Miesięczny": {"Normalny": 120.00, "Ulgowy": 60.00},
+    "90-dniowy": {"Normalny": 320.00, "Ulgowy": 160.00},
+    "Półroczny": {"Normalny": 600.00, "Ulgowy": 300.00},
+    "Roczny": {"Normalny": 1100.00, "Ulgowy": 550.00}
+}
+
+# Kolumny tabeli biletów w kolejności wyświetlania
+TICKET_COLUMNS = ["card_id", "customer_name", "ticket_type", "discount_type",
+                  "valid_from", "valid_to", "price"]
+TICKET_HEADERS = ["Nr karty", "Nazwa klienta", "Typ biletu", "Rodzaj biletu",
+                  "Data od", "Data do", "Cena"]
+
+# Tabele biletów z ich agregatami (liczniki, zmiany ważności w kolejnych dniach);
+# archiwum przechowuje bilety wygasłe dawniej niż okres przechowywania
+TICKET_TABLES = {
+    "tickets": ("ticket_stats", "ticket_validity_buckets"),
+    "tickets_archive": ("ticket_archive_stats", "ticket_archive_validity_buckets"),
+}
+DEFAULT_RETENTION_DAYS = 365
+
+
+def aggregate_statements(table, stats_table, buckets_table):
+    """Zwraca polecenia tworzące agregaty tabeli biletów utrzymywane przez wyzwalacze"""
+    delete_old = f"""
+            UPDATE {stats_table} SET ticket_count = ticket_count - 1, revenue = revenue - OLD.price
+            WHERE ticket_type = OLD.ticket_type AND discount_type = OLD.discount_type;
+            UPDATE {buckets_table}
+            SET ticket_delta = ticket_delta - 1, revenue_delta = revenue_delta - OLD.price
+            WHERE day = OLD.valid_from AND ticket_type = OLD.ticket_type AND discount_type = OLD.discount_type;
+            UPDATE {buckets_table}
+            SET ticket_delta = ticket_delta + 1, revenue_delta = revenue_delta + OLD.price
+            WHERE day = date(OLD.valid_to, '+1 day') AND ticket_type = OLD.ticket_type
+                AND discount_type = OLD.discount_type;"""
+    insert_new = f"""
+            INSERT INTO {stats_table} (ticket_type, discount_type, ticket_count, revenue)
+            VALUES (NEW.ticket_type, NEW.discount_type, 1, NEW.price)
+            ON CONFLICT (ticket_type, discount_type) DO UPDATE
+            SET ticket_count = ticket_count + 1, revenue = revenue + excluded.revenue;
+            INSERT INTO {buckets_table} (day, ticket_type, discount_type, ticket_delta, revenue_delta)
+            VALUES (NEW.valid_from, NEW.ticket_type, NEW.discount_type, 1, NEW.price)
+            ON CONFLICT (day, ticket_type, discount_type) DO UPDATE
+            SET ticket_delta = ticket_delta + 1, revenue_delta = revenue_delta + excluded.revenue_delta;
+            INSERT INTO {buckets_table} (day, ticket_type, discount_type, ticket_delta, revenue_delta)
+            VALUES (date(NEW.valid_to, '+1 day'), NEW.ticket_type, NEW.discount_type, -1, -NEW.price)
+            ON CONFLICT (day, ticket_type, discount_type) DO UPDATE
+            SET ticket_delta = ticket_delta - 1, revenue_delta = revenue_delta + excluded.revenue_delta;"""
+    return [
+        # Agregaty utrzymywane przez wyzwalacze: liczba i przychód na typ/rodzaj
+        f"""
+        CREATE TABLE IF NOT EXISTS {stats_table} (
+            ticket_type TEXT NOT NULL,
+            discount_type TEXT NOT NULL,
+            ticket_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (ticket_type, discount_type)
+        )
+        """,
+        # Zmiany liczby ważnych biletów w kolejnych dniach: +1 od valid_from,
+        # -1 od dnia po valid_to; suma do dnia D daje bilety ważne w dniu D
+        f"""
+        CREATE TABLE IF NOT EXISTS {buckets_table} (
+            day DATE NOT NULL,
+            ticket_type TEXT NOT NULL,
+            discount_type TEXT NOT NULL,
+            ticket_delta INTEGER NOT NULL DEFAULT 0,
+            revenue_delta REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, ticket_type, discount_type)
+        )
+        """,
+        f"""
+        INSERT INTO {stats_table} (ticket_type, discount_type, ticket_count, revenue)
+        SELECT ticket_type, discount_type, COUNT(*), SUM(price)
+        FROM {table} GROUP BY ticket_type, discount_type
+        """,
+        f"""
+        INSERT INTO {buckets_table} (day, ticket_type, discount_type, ticket_delta, revenue_delta)
+        SELECT day, ticket_type, discount_type, SUM(ticket_delta), SUM(revenue_delta) FROM (
+            SELECT valid_from AS day, ticket_type, discount_type, 1 AS ticket_delta, price AS revenue_delta
+            FROM {table}
+            UNION ALL
+            SELECT date(valid_to, '+1 day'), ticket_type, discount_type, -1, -price
+            FROM {table}
+        ) GROUP BY day, ticket_type, discount_type
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_insert AFTER INSERT ON {table} BEGIN{insert_new}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_delete AFTER DELETE ON {table} BEGIN{delete_old}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_update
+        AFTER UPDATE OF ticket_type, discount_type, valid_from, valid_to, price ON {table} BEGIN{delete_old}{insert_new}
+        END
+        """,
+    ]
+
+
+def fts_statements(table, fts_table):
+    """Zwraca polecenia tworzące indeks FTS5 tabeli biletów wraz z wyzwalaczami"""
+    return [
+        # Indeks pełnotekstowy nazwy klienta i numeru karty, z treścią w tabeli biletów
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            card_id, customer_name,
+            content='{table}', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table} (rowid, card_id, customer_name)
+            VALUES (NEW.rowid, NEW.card_id, NEW.customer_name);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, card_id, customer_name)
+            VALUES ('delete', OLD.rowid, OLD.card_id, OLD.customer_name);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_update
+        AFTER UPDATE OF card_id, customer_name ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, card_id, customer_name)
+            VALUES ('delete', OLD.rowid, OLD.card_id, OLD.customer_name);
+            INSERT INTO {fts_table} (rowid, card_id, customer_name)
+            VALUES (NEW.rowid, NEW.card_id, NEW.customer_name);
+        END
+        """,
+    ]
+
+
+# Wersjonowane migracje schematu: (wersja, polecenia SQL)
+SCHEMA_MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS tickets (
+            card_id TEXT PRIMARY KEY,
+            customer_name TEXT NOT NULL,
+            ticket_type TEXT NOT NULL,
+            discount_type TEXT NOT NULL,
+            valid_from DATE NOT NULL,
+            valid_to DATE NOT NULL,
+            price FLOAT NOT NULL
+        )
+        """,
+    ]),
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_tickets_type_discount ON tickets (ticket_type, discount_type)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_validity ON tickets (valid_to, valid_from)",
+    ]),
+    (3, [
+        # Indeksy (kolumna, card_id) dla sortowania i paginacji keyset w tabeli
+        f"CREATE INDEX IF NOT EXISTS idx_tickets_sort_{column} ON tickets ({column}, card_id)"
+        for column in TICKET_COLUMNS[1:]
+    ]),
+    (4, [
+        """
+        CREATE TABLE IF NOT EXISTS card_sequence (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO card_sequence (name, next_value) VALUES ('card_id', 1)",
+    ]),
+    (5, aggregate_statements("tickets", "ticket_stats", "ticket_validity_buckets")),
+    (6, fts_statements("tickets", "tickets_fts")),
+    (7, [
+        # Archiwum biletów wygasłych: ta sama struktura, osobne indeksy i agregaty,
+        # żeby zapytania o bilety bieżące nie przeglądały całej historii
+        """
+        CREATE TABLE IF NOT EXISTS tickets_archive (
+            card_id TEXT PRIMARY KEY,
+            customer_name TEXT NOT NULL,
+            ticket_type TEXT NOT NULL,
+            discount_type TEXT NOT NULL,
+            valid_from DATE NOT NULL,
+            valid_to DATE NOT NULL,
+            price FLOAT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tickets_archive_type_discount ON tickets_archive (ticket_type, discount_type)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_archive_validity ON tickets_archive (valid_to, valid_from)",
+    ] + [
+        f"CREATE INDEX IF NOT EXISTS idx_tickets_archive_sort_{column} ON tickets_archive ({column}, card_id)"
+        for column in TICKET_COLUMNS[1:]
+    ] + aggregate_statements("tickets_archive", "ticket_archive_stats", "ticket_archive_validity_buckets")
+      + fts_statements("tickets_archive", "tickets_archive_fts")),
+]
+
+
+def schema_version(db):
+    """Zwraca wersję schematu zapisaną w PRAGMA user_version"""
+    query = make_query(db)
+    if query.exec_("PRAGMA user_version") and query.next():
+        return int(query.value(0))
+    return 0
+
+
+def migrate_database(db, target_version=None):
+    """Wykonuje brakujące migracje schematu, każdą w osobnej transakcji"""
+    current = schema_version(db)
+    for version, statements in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        if target_version is not None and version > target_version:
+            break
+        db.transaction()
+        query = make_query(db)
+        for statement in statements:
+            if not query.exec_(statement):
+                error = query.lastError().text()
+                db.rollback()
+                raise RuntimeError(f"Migracja {version} nie powiodła się: {error}")
+        # PRAGMA nie przyjmuje parametrów, wersja pochodzi z listy migracji
+        query.exec_(f"PRAGMA user_version = {int(version)}")
+        db.commit()
+        current = version
+    return current
+
+
+def fts_query(text):
+    """Zamienia wpisany tekst na zapytanie FTS5: każde słowo jako prefiks"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def build_filter(ticket_type=None, discount_type=None, valid_on=None, search=None, table="tickets"):
+    """Buduje warunek WHERE z parametrami wiązanymi dla filtrów tabeli"""
+    conditions = []
+    params = []
+    # Przy wyszukiwaniu wiersze wybiera indeks FTS; jednoargumentowy "+" wyłącza
+    # indeksy pozostałych kolumn, żeby planer nie przeglądał ich zakresów
+    column = "+{}".format if search and search.strip() else "{}".format
+    if ticket_type:
+        conditions.append(f"{column('ticket_type')} = ?")
+        params.append(ticket_type)
+    if discount_type:
+        conditions.append(f"{column('discount_type')} = ?")
+        params.append(discount_type)
+    if valid_on:
+        # valid_to jako pierwsza kolumna indeksu idx_tickets_validity
+        conditions.append(f"{column('valid_to')} >= ? AND {column('valid_from')} <= ?")
+        params.extend([valid_on, valid_on])
+    if search and search.strip():
+        conditions.append(f"rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)")
+        params.append(fts_query(search))
+    return " AND ".join(conditions), params
+
+
+def ticket_tables(include_archive=False):
+    """Zwraca nazwy tabel biletów: bieżącej i opcjonalnie archiwum"""
+    return list(TICKET_TABLES) if include_archive else ["tickets"]
+
+
+def ticket_sources(ticket_type=None, discount_type=None, valid_on=None, search=None,
+                   include_archive=False):
+    """Zwraca listę (tabela, warunek WHERE, parametry) z filtrem dla każdej tabeli biletów"""
+    return [(table, *build_filter(ticket_type, discount_type, valid_on, search, table))
+            for table in ticket_tables(include_archive)]
+
+
+def union_select(sources, columns):
+    """Składa zapytanie UNION ALL po tabelach źródłowych; zwraca (sql, parametry)"""
+    arms = []
+    params = []
+    for table, filter_sql, filter_params in sources:
+        sql = f"SELECT {columns} FROM {table}"
+        if filter_sql:
+            sql += f" WHERE {filter_sql}"
+        arms.append(sql)
+        params.extend(filter_params)
+    return " UNION ALL ".join(arms), params
+
+
+def existing_card_ids(db, card_ids):
+    """Zwraca numery kart z listy, które są już w bazie"""
+    # Cała lista jako jeden parametr JSON zamiast tysięcy pojedynczych powiązań;
+    # numery biletów archiwalnych także są zajęte
+    batch = json.dumps(card_ids)
+    sql, params = union_select([(table, "card_id IN (SELECT value FROM json_each(?))", [batch])
+                                for table in TICKET_TABLES], "card_id")
+    query = prepare_query(db, sql, params)
+    query.setForwardOnly(True)
+    if not query.exec_():
+        raise RuntimeError(query.lastError().text())
+    existing = set()
+    while query.next():
+        existing.add(query.value(0))
+    return existing
+
+
+def fetch_ticket(db, card_id, table="tickets"):
+    """Zwraca rekord biletu o podanym numerze karty lub None"""
+    query = prepare_query(db, f"SELECT {', '.join(TICKET_COLUMNS)} FROM {table} WHERE card_id = ?", [card_id])
+    if query.exec_() and query.next():
+        return tuple(query.value(i) for i in range(len(TICKET_COLUMNS)))
+    return None
+
+
+def data_version(db):
+    """Zwraca licznik zmian bazy wprowadzonych przez inne połączenia"""
+    query = make_query(db)
+    if query.exec_("PRAGMA data_version") and query.next():
+        return int(query.value(0))
+    return 0
+
+
+def luhn_check_digit(digits):
+    """Zwraca cyfrę kontrolną Luhna dla ciągu cyfr"""
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+class CardNumberAllocator:
+    """Przydziela unikalne 16-cyfrowe numery kart blokami z tabeli card_sequence"""
+
+    PREFIX = "7"
+    BLOCK_SIZE = 1000
+
+    def __init__(self, db, block_size=None):
+        self.db = db
+        self.block_size = block_size or self.BLOCK_SIZE
+        self._next = 0
+        self._end = 0
+        self._taken = set()
+
+    def format(self, value):
+        """Składa numer karty: prefiks, 14 cyfr sekwencji i cyfra kontrolna"""
+        digits = f"{self.PREFIX}{value:014d}"
+        return digits + luhn_check_digit(digits)
+
+    def next(self):
+        """Zwraca kolejny wolny numer karty"""
+        return self.allocate(1)[0]
+
+    def allocate(self, count, skip=()):
+        """Zwraca listę count wolnych numerów kart; pomija zajęte i podane w skip"""
+        numbers = []
+        while len(numbers) < count:
+            if self._next >= self._end:
+                self._reserve(max(self.block_size, count - len(numbers)))
+            take = min(self._end - self._next, count - len(numbers))
+            block = range(self._next, self._next + take)
+            self._next += take
+            numbers.extend(number for number in map(self.format, block)
+                           if number not in self._taken and number not in skip)
+        return numbers
+
+    def mark_taken(self, card_ids):
+        """Oznacza numery zapisane z pominięciem przydziału jako zajęte w bieżącym bloku"""
+        if self._next < self._end:
+            low, high = self.format(self._next), self.format(self._end - 1)
+            self._taken.update(card_id for card_id in card_ids if low <= card_id <= high)
+
+    def refresh(self):
+        """Ponownie sprawdza, które numery pozostałej części bloku są już w bazie"""
+        self._taken = set()
+        if self._next < self._end:
+            self._load_taken()
+
+    def _reserve(self, size):
+        # RETURNING rezerwuje zakres jednym poleceniem, także przy wielu połączeniach
+        query = prepare_query(self.db, """
+            UPDATE card_sequence SET next_value = next_value + ?
+            WHERE name = 'card_id' RETURNING next_value
+        """, [size])
+        if not query.exec_() or not query.next():
+            raise RuntimeError(f"Nie można zarezerwować numerów kart: {query.lastError().text()}")
+        self._end = int(query.value(0))
+        self._next = self._end - size
+        query.finish()
+        self._taken = set()
+        self._load_taken()
+
+    def _load_taken(self):
+        # Numery nadane wcześniej losowo mogą trafić w zakres; wyszukiwanie po indeksie PK
+        # w tabeli bieżącej i w archiwum
+        bounds = [self.format(self._next), self.format(self._end - 1)]
+        sql, params = union_select([(table, "card_id BETWEEN ? AND ?", bounds) for table in TICKET_TABLES],
+                                   "card_id")
+        taken = prepare_query(self.db, sql, params)
+        taken.setForwardOnly(True)
+        taken.exec_()
+        while taken.next():
+            self._taken.add(taken.value(0))
+
+
+def tune_bulk_connection(db):
+    """Przełącza połączenie w tryb WAL i ustawia pragmy dla zapisów wsadowych"""
+    query = make_query(db)
+    for pragma in ("PRAGMA journal_mode = WAL",
+                   "PRAGMA synchronous = NORMAL",
+                   "PRAGMA cache_size = -65536",
+                   "PRAGMA temp_store = MEMORY"):
+        if not query.exec_(pragma):
+            raise RuntimeError(query.lastError().text())
+
+
+def ticket_totals(db, ticket_type=None, discount_type=None, valid_on=None, include_archive=False):
+    """Zwraca (liczba biletów, przychód) dla filtrów z tabel agregatów"""
+    conditions = []
+    params = []
+    if ticket_type:
+        conditions.append("ticket_type = ?")
+        params.append(ticket_type)
+    if discount_type:
+        conditions.append("discount_type = ?")
+        params.append(discount_type)
+    if valid_on:
+        conditions.append("day <= ?")
+        params.append(valid_on)
+    count, revenue = 0, 0.0
+    for table in ticket_tables(include_archive):
+        stats_table, buckets_table = TICKET_TABLES[table]
+        if valid_on:
+            sql = f"SELECT TOTAL(ticket_delta), TOTAL(revenue_delta) FROM {buckets_table}"
+        else:
+            sql = f"SELECT TOTAL(ticket_count), TOTAL(revenue) FROM {stats_table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        query = prepare_query(db, sql, params)
+        if query.exec_() and query.next():
+            count += int(query.value(0))
+            revenue += float(query.value(1))
+    return count, revenue
+
+
+def ticket_breakdown(db, valid_on, include_archive=False):
+    """Zwraca wiersze (typ, rodzaj, liczba, przychód, ważne w dniu valid_on)"""
+    totals = {}
+    for table in ticket_tables(include_archive):
+        stats_table, buckets_table = TICKET_TABLES[table]
+        query = prepare_query(db, f"""
+            SELECT s.ticket_type, s.discount_type, s.ticket_count, s.revenue,
+                   (SELECT TOTAL(b.ticket_delta) FROM {buckets_table} b
+                    WHERE b.ticket_type = s.ticket_type AND b.discount_type = s.discount_type
+                        AND b.day <= ?)
+            FROM {stats_table} s
+            WHERE s.ticket_count > 0
+        """, [valid_on])
+        if query.exec_():
+            while query.next():
+                key = (query.value(0), query.value(1))
+                count, revenue, valid = totals.get(key, (0, 0.0, 0))
+                totals[key] = (count + int(query.value(2)), revenue + float(query.value(3)),
+                               valid + int(query.value(4)))
+    return [key + value for key, value in sorted(totals.items())]
+
+
+class QueryStats:
+    """Czasy wykonania i liczby wierszy zapytań SQL z dziennikiem wolnych zapytań.
+
+    Rodzajem zapytania jest jego tekst ze znormalizowanymi odstępami; parametry
+    są wiązane, więc wywołania z jednego miejsca w kodzie trafiają do jednej grupy.
+    Zapytania wolniejsze niż threshold_ms są zapisywane do pliku JSON Lines
+    razem z planem z EXPLAIN QUERY PLAN.
+    """
+
+    MAX_SAMPLES = 1000
+    PARAMS_PREVIEW = 200
+
+    def __init__(self, threshold_ms=100.0, log_file=None):
+        self.threshold_ms = threshold_ms
+        self.log_file = log_file
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def kind(sql):
+        """Zwraca rodzaj zapytania: tekst SQL w jednej linii"""
+        return " ".join(sql.split())
+
+    def record(self, db, sql, params, elapsed_ms, rows):
+        """Zapisuje pomiar i, dla wolnego zapytania, wpis z planem do dziennika"""
+        kind = self.kind(sql)
+        with self._lock:
+            samples = self._samples.setdefault(kind, deque(maxlen=self.MAX_SAMPLES))
+            samples.append((elapsed_ms, rows))
+        if elapsed_ms < self.threshold_ms or not self.log_file:
+            return
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "thread": threading.get_ident(),
+            "ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "sql": kind,
+            "params": repr(list(params))[:self.PARAMS_PREVIEW],
+            "plan": self.explain(db, sql, params),
+        }
+        with self._lock, open(self.log_file, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def explain(db, sql, params):
+        """Zwraca kroki planu EXPLAIN QUERY PLAN dla zapytań SELECT/INSERT/UPDATE/DELETE"""
+        if sql.split(None, 1)[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            return []
+        # Zwykłe QSqlQuery, żeby samo EXPLAIN nie trafiało do statystyk
+        query = QSqlQuery(db)
+        query.prepare("EXPLAIN QUERY PLAN " + sql)
+        for value in params:
+            # Dla execBatch plan liczony dla pierwszego wiersza porcji
+            query.addBindValue(value[0] if isinstance(value, list) and value else value)
+        plan = []
+        if query.exec_():
+            while query.next():
+                plan.append(query.value(3))
+        return plan
+
+    def summary(self):
+        """Zwraca wiersze (rodzaj, liczba, p50 ms, p95 ms, maks. ms, średnio wierszy)"""
+        with self._lock:
+            groups = [(kind, list(samples)) for kind, samples in self._samples.items()]
+        rows = []
+        for kind, samples in groups:
+            times = sorted(elapsed for elapsed, _ in samples)
+            counts = [count for _, count in samples if count is not None]
+            rows.append((kind, len(times), percentile(times, 50), percentile(times, 95), times[-1],
+                         sum(counts) / len(counts) if counts else 0.0))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+
+class TimedQuery(QSqlQuery):
+    """QSqlQuery mierzący czas wykonania i pobierania wierszy dla QueryStats.
+
+    Pomiar zapytania SELECT obejmuje także kolejne next() i jest zapisywany po
+    pobraniu ostatniego wiersza, przy finish() lub przy ponownym wykonaniu.
+    """
+
+    def __init__(self, db, stats):
+        super().__init__(db)
+        self._db = db
+        self._stats = stats
+        self._sql = ""
+        self._params = []
+        self._elapsed = None
+        self._rows = 0
+
+    def prepare(self, sql):
+        self._report()
+        self._sql = sql
+        self._params = []
+        return super().prepare(sql)
+
+    def addBindValue(self, value, *args):
+        self._params.append(value)
+        super().addBindValue(value, *args)
+
+    def exec_(self, *args):
+        self._report()
+        if args:
+            self._sql = args[0]
+            self._params = []
+        started = time.perf_counter()
+        ok = super().exec_(*args)
+        self._elapsed = time.perf_counter() - started
+        self._rows = 0
+        if ok and not self.isSelect():
+            self._rows = self.numRowsAffected()
+            self._report()
+        return ok
+
+    def execBatch(self, *args):
+        self._report()
+        started = time.perf_counter()
+        ok = super().execBatch(*args)
+        self._elapsed = time.perf_counter() - started
+        self._rows = len(self._params[0]) if self._params else 0
+        self._report()
+        return ok
+
+    def next(self):
+        started = time.perf_counter()
+        has_row = super().next()
+        if self._elapsed is not None:
+            self._elapsed += time.perf_counter() - started
+            if has_row:
+                self._rows += 1
+            else:
+                self._report()
+        return has_row
+
+    def finish(self):
+        self._report()
+        super().finish()
+
+    def __del__(self):
+        self._report()
+
+    def _report(self):
+        if self._elapsed is None:
+            return
+        elapsed, self._elapsed = self._elapsed, None
+        self._stats.record(self._db, self._sql, self._params, elapsed * 1000, self._rows)
+
+
+# Aktywne statystyki zapytań; None wyłącza pomiary i zapytania nie mają narzutu
+query_stats = None
+
+
+def enable_query_stats(threshold_ms=100.0, log_file=None):
+    """Włącza pomiar wszystkich zapytań i dziennik wolnych zapytań"""
+    global query_stats
+    query_stats = QueryStats(threshold_ms, log_file)
+    return query_stats
+
+
+def percentile(sorted_values, percent):
+    """Zwraca percentyl (metoda najbliższej rangi) z posortowanej listy"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-percent * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def make_query(db):
+    """Tworzy zapytanie dla połączenia, mierzone, gdy włączono statystyki zapytań"""
+    if query_stats is not None:
+        return TimedQuery(db, query_stats)
+    return QSqlQuery(db)
+
+
+def prepare_query(db, sql, params=()):
+    """Przygotowuje zapytanie i wiąże parametry w podanej kolejności"""
+    query = make_query(db)
+    query.prepare(sql)
+    for value in params:
+        query.addBindValue(value)
+    return query
+
+
+class TicketStore:
+    """Logika biletów bez interfejsu: cennik, ważność, zapisy i raporty.
+
+    Każdy wątek dostaje własne nazwane połączenie QSqlDatabase, więc jednego
+    obiektu można używać z okna, wątków roboczych i skryptów wsadowych.
+    """
+
+    BUSY_TIMEOUT_MS = 10000
+    ARCHIVE_BATCH_SIZE = 10000
+    ISSUE_ATTEMPTS = 3
+
+    def __init__(self, database_name="tickets.sqlite"):
+        self.database_name = database_name
+        self._local = threading.local()
+
+    def connection_name(self):
+        """Zwraca nazwę połączenia bieżącego wątku"""
+        return f"tickets-{id(self)}-{threading.get_ident()}"
+
+    def connection(self):
+        """Zwraca (i w razie potrzeby otwiera) połączenie bieżącego wątku"""
+        name = self.connection_name()
+        if QSqlDatabase.contains(name):
+            return QSqlDatabase.database(name)
+        db = QSqlDatabase.addDatabase("QSQLITE", name)
+        db.setDatabaseName(self.database_name)
+        db.setConnectOptions(f"QSQLITE_BUSY_TIMEOUT={self.BUSY_TIMEOUT_MS}")
+        if not db.open():
+            error = db.lastError().databaseText()
+            del db
+            QSqlDatabase.removeDatabase(name)
+            raise RuntimeError(f"Błąd bazy danych: {error}")
+        return db
+
+    def close_connection(self):
+        """Zamyka połączenie bieżącego wątku"""
+        name = self.connection_name()
+        self._local.allocator = None
+        if QSqlDatabase.contains(name):
+            QSqlDatabase.database(name, False).close()
+            QSqlDatabase.removeDatabase(name)
+
+    def allocator(self):
+        """Zwraca przydział numerów kart bieżącego wątku"""
+        if getattr(self._local, "allocator", None) is None:
+            self._local.allocator = CardNumberAllocator(self.connection())
+        return self._local.allocator
+
+    def migrate(self):
+        """Aktualizuje schemat bazy do najnowszej wersji"""
+        return migrate_database(self.connection())
+
+    @staticmethod
+    def price(ticket_type, discount_type):
+        """Zwraca cenę biletu z cennika"""
+        try:
+            return TICKET_PRICES[ticket_type][discount_type]
+        except KeyError:
+            raise ValueError(f"Nieznany bilet: {ticket_type} / {discount_type}") from None
+
+    @staticmethod
+    def valid_to(valid_from, ticket_type):
+        """Zwraca datę końcową (yyyy-MM-dd) dla daty początkowej i typu biletu"""
+        if ticket_type not in TICKET_PERIODS:
+            raise ValueError(f"Nieznany typ biletu: {ticket_type}")
+        start = date.fromisoformat(valid_from)
+        return (start + timedelta(days=TICKET_PERIODS[ticket_type])).isoformat()
+
+    def make_record(self, card_id, customer_name, ticket_type, discount_type, valid_from):
+        """Składa pełny rekord biletu z wyliczoną datą końcową i ceną"""
+        if not customer_name:
+            raise ValueError("Pole nazwy klienta musi być wypełnione!")
+        valid_to = self.valid_to(valid_from, ticket_type)
+        # fromisoformat przyjmuje też np. 20240301, a filtry dat porównują napisy yyyy-MM-dd
+        valid_from = date.fromisoformat(valid_from).isoformat()
+        return (card_id, customer_name, ticket_type, discount_type, valid_from,
+                valid_to, self.price(ticket_type, discount_type))
+
+    def get_ticket(self, card_id):
+        """Zwraca rekord biletu lub None"""
+        return fetch_ticket(self.connection(), card_id)
+
+    def require_ticket(self, card_id):
+        """Zwraca rekord biletu z tabeli bieżącej; bilety archiwalne są tylko do odczytu"""
+        record = self.get_ticket(card_id)
+        if record is None:
+            if fetch_ticket(self.connection(), card_id, "tickets_archive") is not None:
+                raise ValueError(f"Bilet {card_id} jest w archiwum i nie można go zmienić")
+            raise ValueError(f"Brak biletu o numerze {card_id}")
+        return record
+
+    def add_ticket(self, customer_name, ticket_type, discount_type, valid_from):
+        """Wydaje jeden bilet i zwraca jego rekord"""
+        return self.issue_tickets([(customer_name, ticket_type, discount_type, valid_from)])[0]
+
+    def issue_tickets(self, requests):
+        """Wydaje wiele biletów jedną transakcją; requests: (klient, typ, rodzaj, ważny od)"""
+        requests = list(requests)
+        allocator = self.allocator()
+        for attempt in range(self.ISSUE_ATTEMPTS):
+            card_ids = allocator.allocate(len(requests))
+            records = [self.make_record(card_id, *request) for card_id, request in zip(card_ids, requests)]
+            try:
+                self._write_batch(f"""
+                    INSERT INTO tickets ({', '.join(TICKET_COLUMNS)})
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, records)
+            except RuntimeError:
+                # Import z innego połączenia mógł zapisać numery z bloku zarezerwowanego
+                # wcześniej; wtedy lista zajętych jest odświeżana i zapis ponawiany
+                if attempt + 1 == self.ISSUE_ATTEMPTS or not existing_card_ids(self.connection(), card_ids):
+                    raise
+                allocator.refresh()
+            else:
+                return records
+
+    def update_ticket(self, card_id, customer_name, ticket_type, discount_type, valid_from):
+        """Zmienia dane biletu i zwraca (stary rekord, nowy rekord)"""
+        old_record = self.require_ticket(card_id)
+        record = self.make_record(card_id, customer_name, ticket_type, discount_type, valid_from)
+        self._write_batch("""
+            UPDATE tickets
+            SET customer_name = ?, ticket_type = ?, discount_type = ?,
+                valid_from = ?, valid_to = ?, price = ?
+            WHERE card_id = ?
+        """, [record[1:] + record[:1]])
+        return old_record, record
+
+    def renew_tickets(self, card_ids, today=None):
+        """Przedłuża bilety o kolejny okres tego samego typu; zwraca nowe rekordy.
+
+        Ważny bilet zachowuje datę początkową, a okres jest doliczany do daty
+        końcowej; bilet wygasły zaczyna się od dziś. Cena rośnie o cenę okresu.
+        """
+        today = today or date.today().isoformat()
+        records = []
+        for card_id in card_ids:
+            old = self.get_ticket(card_id)
+            if old is None:
+                continue
+            card_id, customer_name, ticket_type, discount_type, valid_from, valid_to, price = old
+            if valid_to < today:
+                valid_from = today
+                valid_to = self.valid_to(today, ticket_type)
+            else:
+                valid_to = self.valid_to(valid_to, ticket_type)
+            price = price + self.price(ticket_type, discount_type)
+            records.append((card_id, customer_name, ticket_type, discount_type, valid_from, valid_to, price))
+        self._write_batch("""
+            UPDATE tickets SET valid_from = ?, valid_to = ?, price = ?
+            WHERE card_id = ?
+        """, [(record[4], record[5], record[6], record[0]) for record in records])
+        return records
+
+    def delete_ticket(self, card_id):
+        """Usuwa bilet i zwraca jego rekord"""
+        record = self.require_ticket(card_id)
+        self._write_batch("DELETE FROM tickets WHERE card_id = ?", [(card_id,)])
+        return record
+
+    def expiring_card_ids(self, within_days, today=None):
+        """Zwraca numery kart biletów ważnych dziś, które wygasają w ciągu within_days dni"""
+        start = date.fromisoformat(today) if today else date.today()
+        end = start + timedelta(days=within_days)
+        query = prepare_query(self.connection(),
+                              "SELECT card_id FROM tickets WHERE valid_to BETWEEN ? AND ? AND valid_from <= ?",
+                              [start.isoformat(), end.isoformat(), start.isoformat()])
+        query.setForwardOnly(True)
+        query.exec_()
+        card_ids = []
+        while query.next():
+            card_ids.append(query.value(0))
+        return card_ids
+
+    def archive_expired(self, retention_days=DEFAULT_RETENTION_DAYS, today=None, progress=None):
+        """Przenosi do archiwum bilety wygasłe ponad retention_days dni temu; zwraca ich liczbę.
+
+        Każda porcja jest osobną krótką transakcją, więc okno i inne połączenia
+        mogą zapisywać między porcjami.
+        """
+        start = date.fromisoformat(today) if today else date.today()
+        cutoff = (start - timedelta(days=retention_days)).isoformat()
+        db = self.connection()
+        columns = ", ".join(TICKET_COLUMNS)
+        control = make_query(db)
+        moved = 0
+        while True:
+            if not control.exec_("BEGIN IMMEDIATE"):
+                raise RuntimeError(control.lastError().text())
+            # Porcja wybierana zakresem indeksu idx_tickets_validity
+            select = prepare_query(db, "SELECT card_id FROM tickets WHERE valid_to < ? LIMIT ?",
+                                   [cutoff, self.ARCHIVE_BATCH_SIZE])
+            select.setForwardOnly(True)
+            card_ids = []
+            if select.exec_():
+                while select.next():
+                    card_ids.append(select.value(0))
+            select.finish()
+            if not card_ids:
+                control.exec_("COMMIT")
+                return moved
+            batch = json.dumps(card_ids)
+            for sql in (f"INSERT INTO tickets_archive ({columns}) SELECT {columns} FROM tickets "
+                        "WHERE card_id IN (SELECT value FROM json_each(?))",
+                        "DELETE FROM tickets WHERE card_id IN (SELECT value FROM json_each(?))"):
+                query = prepare_query(db, sql, [batch])
+                if not query.exec_():
+                    error = query.lastError().text()
+                    control.exec_("ROLLBACK")
+                    raise RuntimeError(f"Archiwizacja przerwana: {error}")
+            control.exec_("COMMIT")
+            moved += len(card_ids)
+            if progress is not None:
+                progress(moved)
+
+    def totals(self, ticket_type=None, discount_type=None, valid_on=None, include_archive=False):
+        """Zwraca (liczba biletów, przychód) z tabel agregatów"""
+        return ticket_totals(self.connection(), ticket_type, discount_type, valid_on, include_archive)
+
+    def breakdown(self, valid_on=None, include_archive=False):
+        """Zwraca podsumowanie na typ i rodzaj biletu"""
+        return ticket_breakdown(self.connection(), valid_on or date.today().isoformat(), include_archive)
+
+    def _write_batch(self, sql, rows):
+        if not rows:
+            return
+        db = self.connection()
+        query = make_query(db)
+        query.prepare(sql)
+        for column in zip(*rows):
+            query.addBindValue(list(column))
+        # BEGIN IMMEDIATE od razu rezerwuje zapis, więc równoległe wątki czekają
+        # na blokadę zamiast kończyć się błędem "database is locked"
+        control = make_query(db)
+        if not control.exec_("BEGIN IMMEDIATE"):
+            raise RuntimeError(control.lastError().text())
+        if not query.execBatch():
+            error = query.lastError().text()
+            control.exec_("ROLLBACK")
+            raise RuntimeError(error)
+        control.exec_("COMMIT")
+
+
+class TicketTableModel(QAbstractTableModel):
+    """Model tylko do odczytu pobierający bilety stronami (paginacja keyset).
+
+    Źródłem wierszy jest lista (tabela, warunek, parametry); przy kilku tabelach
+    (bilety bieżące i archiwum) strony są łączone przez UNION ALL.
+    """
+
+    PAGE_SIZE = 200
+    CACHE_ROWS = 4000
+    MAX_ANCHORS = 10000
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.sources = [("tickets", "", [])]
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+        self._row_count = 0
+        # Wiersze w pamięci podręcznej: indeks -> rekord
+        self._rows = {}
+        # Rzadki indeks kluczy sortowania: indeks wiersza -> (wartość, card_id)
+        self._anchors = {}
+        self.last_error = ""
+        # Opcjonalne źródło liczby wierszy bez skanowania tabeli (np. agregaty)
+        self.count_source = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(TICKET_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return TICKET_HEADERS[section]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        record = self.record(index.row())
+        return record[index.column()] if record else None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Zmienia kolejność sortowania na indeksowane ORDER BY"""
+        self.sort_column = column
+        self.sort_order = order
+        self.refresh()
+
+    def set_filter(self, sources):
+        """Ustawia tabele z warunkami WHERE i parametrami, po czym przeładowuje model"""
+        self.sources = [(table, filter_sql, list(filter_params))
+                        for table, filter_sql, filter_params in sources]
+        self.refresh()
+
+    def refresh(self):
+        """Odrzuca pamięć podręczną i ponownie liczy wiersze"""
+        self.beginResetModel()
+        self._rows.clear()
+        self._anchors.clear()
+        self._row_count = self.count_rows()
+        self.endResetModel()
+
+    def count_rows(self):
+        """Zwraca liczbę wierszy spełniających aktywny filtr"""
+        if self.count_source is not None:
+            count = self.count_source()
+            if count is not None:
+                return count
+        sql, params = union_select(self.sources, "COUNT(*) AS n")
+        query = prepare_query(self.db, f"SELECT TOTAL(n) FROM ({sql})", params)
+        if query.exec_() and query.next():
+            return int(query.value(0))
+        self.last_error = query.lastError().text()
+        return 0
+
+    def record(self, row):
+        """Zwraca rekord wiersza, pobierając jego stronę w razie potrzeby"""
+        if row not in self._rows and 0 <= row < self._row_count:
+            self._fetch_page(row)
+        return self._rows.get(row)
+
+    def order_by(self):
+        """Zwraca klauzulę ORDER BY zgodną z indeksem (kolumna, card_id)"""
+        direction = "ASC" if self.sort_order == Qt.AscendingOrder else "DESC"
+        if self.sort_column == 0:
+            return f"card_id {direction}"
+        return f"{TICKET_COLUMNS[self.sort_column]} {direction}, card_id {direction}"
+
+    def sort_key(self, record):
+        """Zwraca klucz keyset rekordu dla aktywnego sortowania"""
+        return (record[self.sort_column], record[0])
+
+    def matches_filter(self, record, stored=True):
+        """Sprawdza, czy rekord spełnia aktywny filtr; None, gdy nie da się tego ustalić"""
+        # Dodawane, zmieniane i usuwane rekordy są zawsze w tabeli bieżącej (pierwsze źródło)
+        table, filter_sql, filter_params = self.sources[0]
+        if not filter_sql:
+            return True
+        if stored:
+            # Rekord zapisany w bazie: jedno wyszukiwanie po kluczu głównym
+            query = prepare_query(self.db, f"SELECT 1 FROM {table} WHERE card_id = ? AND ({filter_sql})",
+                                  [record[0]] + filter_params)
+        else:
+            # Rekord już usunięty: warunek sprawdzany na samych wartościach
+            columns = ", ".join(f"? AS {column}" for column in TICKET_COLUMNS)
+            query = prepare_query(self.db, f"SELECT 1 FROM (SELECT {columns}) WHERE {filter_sql}",
+                                  list(record) + filter_params)
+        if not query.exec_():
+            return None
+        return query.next()
+
+    def insert_record(self, record):
+        """Wstawia do modelu nowy rekord bez ponownego zapytania o całą tabelę"""
+        if not self.matches_filter(record):
+            return
+        lower, upper = self._neighbours(self.sort_key(record))
+        row = lower + 1
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._shift(row, 1)
+        self._row_count += 1
+        # Rekord trafia do pamięci podręcznej tylko między sąsiadującymi znanymi wierszami,
+        # w przeciwnym razie jego dokładne miejsce ustali pobranie strony
+        if upper == row or (upper is None and row == self._row_count - 1):
+            self._rows[row] = tuple(record)
+        self.endInsertRows()
+
+    def remove_record(self, record):
+        """Usuwa z modelu rekord, który został już usunięty z bazy; True, gdy model przeładowano"""
+        row = self._cached_row(record[0])
+        if row is None:
+            matches = self.matches_filter(record, stored=False)
+            if matches is None:
+                # Warunek zależy od danych usuniętego wiersza (np. wyszukiwanie FTS)
+                self.refresh()
+                return True
+            if not matches:
+                return False
+            row = self._neighbours(self.sort_key(record))[0] + 1
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._rows.pop(row, None)
+        self._anchors.pop(row, None)
+        self._shift(row + 1, -1)
+        self._row_count -= 1
+        self.endRemoveRows()
+        return False
+
+    def update_record(self, old_record, new_record):
+        """Aktualizuje rekord w miejscu lub przenosi go, gdy zmienił się klucz sortowania"""
+        row = self._cached_row(old_record[0])
+        if (row is not None and self.sort_key(old_record) == self.sort_key(new_record)
+                and self.matches_filter(new_record)):
+            self._rows[row] = tuple(new_record)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(TICKET_COLUMNS) - 1))
+            return
+        # Po przeładowaniu liczba wierszy obejmuje już nowy rekord
+        if not self.remove_record(old_record):
+            self.insert_record(new_record)
+
+    def _precedes(self, key, other):
+        if self.sort_order == Qt.AscendingOrder:
+            return key < other
+        return key > other
+
+    def _neighbours(self, key):
+        # Najbliższe znane wiersze przed i za kluczem; przeszukiwana jest tylko
+        # ograniczona pamięć podręczna i rzadki indeks, nie cała tabela
+        lower, upper = -1, None
+        known = [(row, self.sort_key(record)) for row, record in self._rows.items()]
+        known.extend(self._anchors.items())
+        for row, known_key in known:
+            if self._precedes(known_key, key):
+                lower = max(lower, row)
+            elif upper is None or row < upper:
+                upper = row
+        return lower, upper
+
+    def _cached_row(self, card_id):
+        for row, record in self._rows.items():
+            if record[0] == card_id:
+                return row
+        return None
+
+    def _shift(self, first_row, delta):
+        self._rows = {row + delta if row >= first_row else row: record
+                      for row, record in self._rows.items()}
+        self._anchors = {row + delta if row >= first_row else row: key
+                         for row, key in self._anchors.items()}
+
+    def _fetch_page(self, row):
+        start = row - row % self.PAGE_SIZE
+        # Najbliższy znany klucz przed stroną; resztę odległości pokrywa OFFSET
+        known = [i for i in self._anchors if i < start]
+        anchor_row = max(known, default=-1)
+        anchor_key = self._anchors.get(anchor_row)
+
+        column = TICKET_COLUMNS[self.sort_column]
+        ascending = self.sort_order == Qt.AscendingOrder
+        offset = start - anchor_row - 1
+        arms = []
+        for table, filter_sql, filter_params in self.sources:
+            conditions = [f"({filter_sql})"] if filter_sql else []
+            params = list(filter_params)
+            if anchor_key is not None:
+                operator = ">" if ascending else "<"
+                if self.sort_column == 0:
+                    conditions.append(f"card_id {operator} ?")
+                    params.append(anchor_key[1])
+                else:
+                    conditions.append(f"({column}, card_id) {operator} (?, ?)")
+                    params.extend(anchor_key)
+            arm = f"SELECT {', '.join(TICKET_COLUMNS)} FROM {table}"
+            if conditions:
+                arm += " WHERE " + " AND ".join(conditions)
+            arms.append((arm + f" ORDER BY {self.order_by()}", params))
+
+        if len(arms) == 1:
+            sql, params = arms[0]
+        else:
+            # Każda tabela zwraca co najwyżej tyle wierszy, ile wymaga strona,
+            # a scalenie sortuje tylko te wstępnie ograniczone wyniki
+            sql = " UNION ALL ".join(f"SELECT * FROM ({arm} LIMIT ?)" for arm, _ in arms)
+            sql += f" ORDER BY {self.order_by()}"
+            params = [value for _, arm_params in arms for value in arm_params + [self.PAGE_SIZE + offset]]
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([self.PAGE_SIZE, offset])
+
+        query = prepare_query(self.db, sql, params)
+        query.setForwardOnly(True)
+        if not query.exec_():
+            self.last_error = query.lastError().text()
+            return
+        current = start
+        while query.next():
+            self._rows[current] = tuple(query.value(i) for i in range(len(TICKET_COLUMNS)))
+            current += 1
+        if current > start:
+            self._anchors[current - 1] = self.sort_key(self._rows[current - 1])
+        self._evict(row)
+
+    def _evict(self, row):
+        if len(self._rows) > self.CACHE_ROWS:
+            # Zostają wiersze najbliższe ostatnio oglądanemu fragmentowi tabeli
+            keep = sorted(self._rows, key=lambda i: abs(i - row))[:self.CACHE_ROWS]
+            self._rows = {i: self._rows[i] for i in keep}
+        if len(self._anchors) > self.MAX_ANCHORS:
+            # Przerzedzenie zachowuje pokrycie całej tabeli co drugim kluczem
+            self._anchors = {i: key for n, (i, key) in enumerate(sorted(self._anchors.items()))
+                             if n % 2 == 0}
+
+
+class CsvExportWorker(QThread):
+    """Eksportuje bilety do CSV w osobnym wątku i na osobnym połączeniu"""
+
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(int, float)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    BATCH_SIZE = 5000
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, store, file_name, sources=(("tickets", "", ()),),
+                 order_by="card_id", compress=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.file_name = file_name
+        self.sources = list(sources)
+        self.order_by = order_by
+        self.compress = file_name.endswith(".gz") if compress is None else compress
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Przerywa eksport po zapisaniu bieżącej porcji"""
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            self.export(self.store.connection())
+        except RuntimeError as e:
+            self.failed.emit(str(e))
+        finally:
+            self.store.close_connection()
+
+    def export(self, db):
+        """Strumieniuje wiersze zapytania porcjami do buforowanego pliku"""
+        sql, params = union_select(self.sources, ", ".join(TICKET_COLUMNS))
+        query = prepare_query(db, f"{sql} ORDER BY {self.order_by}", params)
+        # Kursor tylko do przodu: SQLite zwraca kolejne wiersze bez buforowania wyniku
+        query.setForwardOnly(True)
+        if not query.exec_():
+            self.failed.emit(query.lastError().text())
+            return
+
+        started = time.perf_counter()
+        rows = 0
+        columns = range(len(TICKET_COLUMNS))
+        try:
+            if self.compress:
+                file = gzip.open(self.file_name, "wt", newline="", encoding="utf-8")
+            else:
+                file = open(self.file_name, "w", newline="", encoding="utf-8",
+                            buffering=self.BUFFER_SIZE)
+            with file:
+                writer = csv.writer(file)
+                writer.writerow(TICKET_HEADERS)
+                batch = []
+                while query.next():
+                    batch.append([query.value(i) for i in columns])
+                    if len(batch) == self.BATCH_SIZE:
+                        writer.writerows(batch)
+                        rows += len(batch)
+                        batch.clear()
+                        self.progress.emit(rows)
+                        if self._cancel_requested:
+                            break
+                writer.writerows(batch)
+                rows += len(batch)
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+
+        if self._cancel_requested:
+            os.remove(self.file_name)
+            self.cancelled.emit()
+            return
+        elapsed = time.perf_counter() - started
+        self.progress.emit(rows)
+        self.completed.emit(rows, rows / elapsed if elapsed > 0 else float(rows))
+
+
+class TicketImportWorker(QThread):
+    """Importuje bilety z plików CSV/JSONL dużymi transakcjami w osobnym wątku"""
+
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(int, int, str)
+    failed = pyqtSignal(str)
+
+    CHUNK_SIZE = 20000
+
+    def __init__(self, store, file_name, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.file_name = file_name
+        self.rejects_name = file_name + ".odrzucone.csv"
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Przerywa import po zatwierdzeniu bieżącej porcji"""
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            tune_bulk_connection(self.store.connection())
+            self.allocator = self.store.allocator()
+            self.import_file(self.store.connection())
+        except Exception as e:
+            # Wyjątek nie może opuścić wątku: okno czeka na failed, a połączenie musi zostać zamknięte
+            self.failed.emit(str(e))
+        finally:
+            self.allocator = None
+            self.store.close_connection()
+
+    def read_records(self):
+        """Zwraca kolejne rekordy pliku jako (nr linii, słownik kolumna -> wartość)"""
+        names = dict(zip(TICKET_HEADERS, TICKET_COLUMNS))
+        names.update((column, column) for column in TICKET_COLUMNS)
+        base_name = self.file_name[:-3] if self.file_name.endswith(".gz") else self.file_name
+        opener = gzip.open if self.file_name.endswith(".gz") else open
+        with opener(self.file_name, "rt", newline="", encoding="utf-8") as file:
+            if base_name.endswith(".jsonl"):
+                for line_number, line in enumerate(file, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        item = None
+                    if not isinstance(item, dict):
+                        yield line_number, {"_raw": line.strip()}
+                        continue
+                    yield line_number, {names.get(key, key): value for key, value in item.items()}
+            else:
+                reader = csv.reader(file)
+                header = [names.get(name.strip(), name.strip()) for name in next(reader, [])]
+                for line_number, row in enumerate(reader, 2):
+                    yield line_number, dict(zip(header, row))
+
+    def import_file(self, db):
+        """Wczytuje plik porcjami, waliduje je i zapisuje poprawne wiersze"""
+        imported = rejected = processed = 0
+        with open(self.rejects_name, "w", newline="", encoding="utf-8") as rejects_file:
+            rejects = csv.writer(rejects_file)
+            rejects.writerow(["Linia", "Powód"] + TICKET_HEADERS)
+            chunk = []
+            for record in self.read_records():
+                chunk.append(record)
+                if len(chunk) == self.CHUNK_SIZE:
+                    ok, bad = self.import_chunk(db, chunk, rejects)
+                    imported, rejected, processed = imported + ok, rejected + bad, processed + len(chunk)
+                    chunk = []
+                    self.progress.emit(processed)
+                    if self._cancel_requested:
+                        break
+            if chunk and not self._cancel_requested:
+                ok, bad = self.import_chunk(db, chunk, rejects)
+                imported, rejected = imported + ok, rejected + bad
+                processed += len(chunk)
+        if not rejected:
+            os.remove(self.rejects_name)
+        self.progress.emit(processed)
+        self.completed.emit(imported, rejected, self.rejects_name if rejected else "")
+
+    def validate_chunk(self, chunk):
+        """Waliduje porcję wiersz po wierszu i wylicza datę końcową oraz cenę z cenników"""
+        line_numbers = [line_number for line_number, _ in chunk]
+        card_ids = [str(record.get("card_id") or "").strip() for _, record in chunk]
+        names = [str(record.get("customer_name") or "").strip() for _, record in chunk]
+        # Wartości z JSONL mogą być listami lub liczbami; po zamianie na napis trafiają do odrzuconych
+        types = [str(record.get("ticket_type") or "").strip() for _, record in chunk]
+        discounts = [str(record.get("discount_type") or "").strip() for _, record in chunk]
+        starts = [str(record.get("valid_from") or "").strip() for _, record in chunk]
+
+        # Wiersze bez numeru karty dostają numery z jednego zarezerwowanego bloku,
+        # z pominięciem numerów podanych jawnie w tej samej porcji
+        missing = [n for n, card_id in enumerate(card_ids) if not card_id]
+        for n, card_id in zip(missing, self.allocator.allocate(len(missing), set(card_ids))):
+            card_ids[n] = card_id
+
+        # Daty w jednym pliku mocno się powtarzają, więc wynik liczony raz na parę;
+        # zwraca kanoniczne daty (początek, koniec), bo fromisoformat przyjmuje też np. 20240301
+        dates_cache = {}
+
+        def dates_for(valid_from, ticket_type):
+            key = (valid_from, ticket_type)
+            if key not in dates_cache:
+                try:
+                    start = date.fromisoformat(valid_from)
+                    end = start + timedelta(days=TICKET_PERIODS[ticket_type])
+                    dates_cache[key] = (start.isoformat(), end.isoformat())
+                except ValueError:
+                    dates_cache[key] = None
+            return dates_cache[key]
+
+        columns = [[] for _ in TICKET_COLUMNS]
+        lines = []
+        errors = []
+        seen = set()
+        for n, (card_id, name, ticket_type, discount_type, valid_from) in enumerate(
+                zip(card_ids, names, types, discounts, starts)):
+            if "_raw" in chunk[n][1]:
+                reason = "Nieprawidłowy format wiersza"
+            elif len(card_id) != 16 or not card_id.isdigit():
+                reason = "Nieprawidłowy numer karty"
+            elif card_id in seen:
+                reason = "Powtórzony numer karty w pliku"
+            elif not name:
+                reason = "Brak nazwy klienta"
+            elif ticket_type not in TICKET_PERIODS:
+                reason = "Nieznany typ biletu"
+            elif discount_type not in TICKET_PRICES[ticket_type]:
+                reason = "Nieznany rodzaj biletu"
+            elif dates_for(valid_from, ticket_type) is None:
+                reason = "Nieprawidłowa data początkowa"
+            else:
+                seen.add(card_id)
+                record = (card_id, name, ticket_type, discount_type) + dates_for(valid_from, ticket_type) + (
+                          TICKET_PRICES[ticket_type][discount_type],)
+                for column, value in zip(columns, record):
+                    column.append(value)
+                lines.append(line_numbers[n])
+                continue
+            errors.append((line_numbers[n], reason, chunk[n][1]))
+        return columns, lines, errors
+
+    def import_chunk(self, db, chunk, rejects):
+        """Zapisuje porcję jednym execBatch w jednej transakcji"""
+        columns, lines, errors = self.validate_chunk(chunk)
+
+        existing = existing_card_ids(db, columns[0])
+        if existing:
+            records = dict(chunk)
+            keep = []
+            for n, card_id in enumerate(columns[0]):
+                if card_id in existing:
+                    errors.append((lines[n], "Numer karty już istnieje", records[lines[n]]))
+                else:
+                    keep.append(n)
+            columns = [[column[n] for n in keep] for column in columns]
+
+        for line_number, reason, record in errors:
+            values = [record["_raw"]] if "_raw" in record else [record.get(column, "") for column in TICKET_COLUMNS]
+            rejects.writerow([line_number, reason] + values)
+        if not columns[0]:
+            return 0, len(errors)
+
+        db.transaction()
+        query = make_query(db)
+        query.prepare(f"""
+            INSERT INTO tickets ({', '.join(TICKET_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """)
+        for column in columns:
+            query.addBindValue(column)
+        if not query.execBatch():
+            error = query.lastError().text()
+            db.rollback()
+            raise RuntimeError(f"Import przerwany przy zapisie porcji: {error}")
+        db.commit()
+        # Jawne numery z pliku mogą leżeć w bloku zarezerwowanym przed ich zapisem
+        self.allocator.mark_taken(columns[0])
+        return len(columns[0]), len(errors)
+
+
+class ArchiveWorker(QThread):
+    """Przenosi wygasłe bilety do archiwum porcjami w osobnym wątku"""
+
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, store, retention_days, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.retention_days = retention_days
+
+    def run(self):
+        try:
+            moved = self.store.archive_expired(self.retention_days, progress=self.progress.emit)
+        except RuntimeError as e:
+            self.failed.emit(str(e))
+        else:
+            self.completed.emit(moved)
+        finally:
+            self.store.close_connection()
+
 
 class Tickets(QMainWindow):
-    def __init__(self):
+    def __init__(self, store=None):
         super().__init__()
         self.setWindowTitle("Zarządzanie biletami")
         self.resize(800, 600)
         
-        self.ticket_periods = {
-            "Miesięczny": 30,
-            "90-dniowy": 90,
-            "Półroczny": 182,
-            "Roczny": 365
-        }
-
-        self.ticket_prices = {
-            "Miesięczny": {"Normalny": 120.00, "Ulgowy": 60.00},
-            "90-dniowy": {"Normalny": 320.00, "Ulgowy": 160.00},
-            "Półroczny": {"Normalny": 600.00, "Ulgowy": 300.00},
-            "Roczny": {"Normalny": 1100.00, "Ulgowy": 550.00}
-        }
+        self.ticket_periods = TICKET_PERIODS
+        self.ticket_prices = TICKET_PRICES
+        self.store = store or TicketStore()
+        self.db = self.store.connection()
         
         self.setup_ui()
         self.setup_database()
@@ -85,20 +1520,34 @@ class Tickets(QMainWindow):
         self.table = QTableView()
         self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.setSelectionMode(QTableView.SingleSelection)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
 
         # Przyciski funkcjonalności dodatkowej
         buttons_down_layout = QHBoxLayout()
         self.export_CSV_button = QPushButton("Eksportuj do CSV")
+        self.import_button = QPushButton("Importuj bilety")
+        self.archive_button = QPushButton("Archiwizuj wygasłe")
+        self.include_archive = QCheckBox("Uwzględnij archiwum")
         self.filter_type = QComboBox()
         self.filter_type.addItems(["Wszystkie"] + list(self.ticket_periods.keys()))
         self.filter_discount = QComboBox()
         self.filter_discount.addItems(["Wszystkie", "Normalny", "Ulgowy"])
         self.show_valid = QComboBox()
         self.show_valid.addItems(["Wszystkie", "Ważne dzisiaj"])
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Szukaj: klient lub nr karty")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        buttons_down_layout.addWidget(self.search_input)
         buttons_down_layout.addWidget(self.filter_type)
         buttons_down_layout.addWidget(self.filter_discount)
         buttons_down_layout.addWidget(self.show_valid)
+        buttons_down_layout.addWidget(self.include_archive)
         buttons_down_layout.addWidget(self.export_CSV_button)
+        buttons_down_layout.addWidget(self.import_button)
+        buttons_down_layout.addWidget(self.archive_button)
 
         label_down_layout = QHBoxLayout()
         label_down_layout.setSpacing(5)  
@@ -106,14 +1555,46 @@ class Tickets(QMainWindow):
         self.count_label = QLabel("0")  
         label_down_layout.addWidget(count_label)
         label_down_layout.addWidget(self.count_label)
+        label_down_layout.addSpacing(20)
+        label_down_layout.addWidget(QLabel("Przychód: "))
+        self.revenue_label = QLabel("0.00")
+        label_down_layout.addWidget(self.revenue_label)
         label_down_layout.addStretch()  
 
+        # Panel statystyk z tabel agregatów
+        self.stats_box = QGroupBox("Statystyki")
+        stats_layout = QVBoxLayout(self.stats_box)
+        self.stats_table = QTableWidget(0, 5)
+        self.stats_table.setHorizontalHeaderLabels(
+            ["Typ biletu", "Rodzaj biletu", "Liczba", "Przychód", "Ważne dzisiaj"])
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.stats_table.setMaximumHeight(180)
+        stats_layout.addWidget(self.stats_table)
+
+        # Panel czasów zapytań SQL, widoczny tylko przy włączonych statystykach zapytań
+        self.query_box = QGroupBox("Zapytania SQL")
+        query_layout = QVBoxLayout(self.query_box)
+        self.query_table = QTableWidget(0, 6)
+        self.query_table.setHorizontalHeaderLabels(
+            ["Zapytanie", "Liczba", "p50 [ms]", "p95 [ms]", "Maks. [ms]", "Wiersze"])
+        self.query_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.query_table.verticalHeader().setVisible(False)
+        self.query_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.query_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.query_table.setMaximumHeight(180)
+        query_layout.addWidget(self.query_table)
+        self.query_box.setVisible(query_stats is not None)
+
         # Dodawanie wszystkich elementów do głównego layoutu
         self.layout.addLayout(self.form_layout)
         self.layout.addLayout(buttons_layout)
         self.layout.addWidget(self.table)
         self.layout.addLayout(buttons_down_layout)
         self.layout.addLayout(label_down_layout)
+        self.layout.addWidget(self.stats_box)
+        self.layout.addWidget(self.query_box)
         
         # Połączenia sygnałów
         self.ticket_type.currentTextChanged.connect(self.update_price)
@@ -126,48 +1607,50 @@ class Tickets(QMainWindow):
         self.table.clicked.connect(self.on_row_clicked)
         self.clear_button.clicked.connect(self.clear_form)
         self.export_CSV_button.clicked.connect(self.export_to_CSV)
+        self.import_button.clicked.connect(self.import_tickets)
+        self.archive_button.clicked.connect(self.archive_tickets)
         self.filter_type.currentTextChanged.connect(self.apply_filters)
         self.filter_discount.currentTextChanged.connect(self.apply_filters)
         self.show_valid.currentTextChanged.connect(self.apply_filters)
+        self.include_archive.toggled.connect(self.apply_filters)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_timer.timeout.connect(self.apply_filters)
 
 
     def setup_database(self):
-        """Tworzy tabelę w bazie danych SQLite"""
-        query = QSqlQuery()
-        query.exec_("""
-            CREATE TABLE IF NOT EXISTS tickets (
-                card_id TEXT PRIMARY KEY,
-                customer_name TEXT NOT NULL,
-                ticket_type TEXT NOT NULL,
-                discount_type TEXT NOT NULL,
-                valid_from DATE NOT NULL,
-                valid_to DATE NOT NULL,
-                price FLOAT NOT NULL
-            )
-        """)
+        """Tworzy lub aktualizuje schemat bazy danych SQLite"""
+        try:
+            self.store.migrate()
+        except RuntimeError as e:
+            QMessageBox.critical(self, "Błąd", str(e))
 
     def generate_card_id(self):
         """Generuje 16-cyfrowy numer karty"""
-        return ''.join([str(random.randint(0, 9)) for _ in range(16)])
+        return self.store.allocator().next()
 
     def update_price(self):
         """Aktualizuje cenę na podstawie wybranego typu biletu i rodzaju ulgi"""
-        ticket_type = self.ticket_type.currentText()
-        discount_type = self.ticket_discount.currentText()
-        price = self.ticket_prices[ticket_type][discount_type]
+        price = self.store.price(self.ticket_type.currentText(), self.ticket_discount.currentText())
         self.price.setText(f"{price:.2f}")
 
     def update_valid_to(self):
         """Aktualizuje datę końcową na podstawie typu biletu i daty początkowej"""
-        start_date = self.valid_from.date().toPyDate()
-        days = self.ticket_periods[self.ticket_type.currentText()]
-        end_date = start_date + timedelta(days=days)
-        self.valid_to.setDate(QDate.fromString(end_date.strftime("%Y-%m-%d"), "yyyy-MM-dd"))
+        end_date = self.store.valid_to(self.valid_from.date().toString("yyyy-MM-dd"),
+                                       self.ticket_type.currentText())
+        self.valid_to.setDate(QDate.fromString(end_date, "yyyy-MM-dd"))
 
     def update_ticket_count(self):
-        """Aktualizuje licznik biletów"""
-        count = self.model.rowCount()
+        """Aktualizuje licznik biletów, przychód i panel statystyk"""
+        count, revenue = self.filtered_totals()
         self.count_label.setText(str(count))
+        self.revenue_label.setText(f"{revenue:.2f}")
+
+        rows = self.store.breakdown(include_archive=self.active_filter[4])
+        self.stats_table.setRowCount(len(rows))
+        for row, (ticket_type, discount_type, count, revenue, valid_today) in enumerate(rows):
+            for column, value in enumerate([ticket_type, discount_type, str(count),
+                                            f"{revenue:.2f}", str(valid_today)]):
+                self.stats_table.setItem(row, column, QTableWidgetItem(value))
 
     def add_ticket(self):
         """Dodaje nowy bilet do bazy danych"""
@@ -176,52 +1659,63 @@ class Tickets(QMainWindow):
             return
         
         try:
-            price = float(self.price.text())
-        except ValueError:
-            QMessageBox.warning(self, "Błąd", "Nieprawidłowa cena biletu!")
+            record = self.store.add_ticket(self.customer_name.text(), self.ticket_type.currentText(),
+                                           self.ticket_discount.currentText(),
+                                           self.valid_from.date().toString("yyyy-MM-dd"))
+        except (ValueError, RuntimeError) as e:
+            QMessageBox.critical(self, "Błąd", str(e))
             return
-        
-        query = QSqlQuery()
-        query.prepare("""
-            INSERT INTO tickets (card_id, customer_name, ticket_type, discount_type, 
-                               valid_from, valid_to, price)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """)
-        
-        card_id = self.generate_card_id()
-        
-        query.addBindValue(card_id)
-        query.addBindValue(self.customer_name.text())
-        query.addBindValue(self.ticket_type.currentText())
-        query.addBindValue(self.ticket_discount.currentText())
-        query.addBindValue(self.valid_from.date().toString("yyyy-MM-dd"))
-        query.addBindValue(self.valid_to.date().toString("yyyy-MM-dd"))
-        query.addBindValue(price)
-        
-        if query.exec_():
-            QSqlDatabase.database().commit()
-            self.model.select()
-            self.clear_form()
-            self.update_ticket_count()
-            QMessageBox.information(self, "Sukces", f"Bilet został dodany!\nNumer karty: {card_id}")
-        else:
-            QMessageBox.critical(self, "Błąd", query.lastError().text())
+
+        self.model.insert_record(record)
+        self.update_ticket_count()
+        self.clear_form()
+        QMessageBox.information(self, "Sukces", f"Bilet został dodany!\nNumer karty: {record[0]}")
     
     def load_data(self):
         """Wczytuje dane z bazy danych do tabeli"""
-        self.model = QSqlTableModel(db=QSqlDatabase.database())
-        self.model.setTable("tickets")
-        
-        self.model.setHeaderData(0, Qt.Horizontal, "Nr karty")
-        self.model.setHeaderData(1, Qt.Horizontal, "Nazwa klienta")
-        self.model.setHeaderData(2, Qt.Horizontal, "Typ biletu")
-        self.model.setHeaderData(3, Qt.Horizontal, "Rodzaj biletu")
-        self.model.setHeaderData(4, Qt.Horizontal, "Data od")
-        self.model.setHeaderData(5, Qt.Horizontal, "Data do")
-        self.model.setHeaderData(6, Qt.Horizontal, "Cena")
-        
+        self.model = TicketTableModel(self.db, self)
+        # Filtr, według którego model pobiera wiersze; licznik musi używać tego samego
+        self.active_filter = (None, None, None, "", False)
+        self.model.count_source = lambda: self.filtered_totals()[0]
         self.table.setModel(self.model)
-        self.model.select()
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.AscendingOrder)
+        self.update_ticket_count()
+
+        # Zmiany z innych połączeń (import, inne okna) wymagają pełnego odświeżenia
+        self.data_version = data_version(self.db)
+        self.change_timer = QTimer(self)
+        self.change_timer.timeout.connect(self.check_external_changes)
+        self.change_timer.start(2000)
+        if query_stats is not None:
+            self.change_timer.timeout.connect(self.update_query_stats)
+
+    def check_external_changes(self):
+        """Odświeża tabelę, jeśli baza została zmieniona przez inne połączenie"""
+        version = data_version(self.db)
+        if version != self.data_version:
+            self.data_version = version
+            self.refresh_model()
+
+    def update_query_stats(self):
+        """Odświeża panel percentyli czasów zapytań SQL"""
+        rows = query_stats.summary()
+        self.query_table.setRowCount(len(rows))
+        for row, (kind, count, p50, p95, slowest, rows_fetched) in enumerate(rows):
+            item = QTableWidgetItem(kind)
+            item.setToolTip(kind)
+            self.query_table.setItem(row, 0, item)
+            for column, value in enumerate([str(count), f"{p50:.2f}", f"{p95:.2f}", f"{slowest:.2f}",
+                                            f"{rows_fetched:.0f}"], 1):
+                self.query_table.setItem(row, column, QTableWidgetItem(value))
+
+    def refresh_model(self):
+        """Ponownie wczytuje dane z aktywnym filtrem i sortowaniem"""
+        self.data_version = data_version(self.db)
+        self.model.refresh()
+        if self.model.last_error:
+            QMessageBox.critical(self, "Błąd", self.model.last_error)
+            self.model.last_error = ""
         self.update_ticket_count()
 
     def on_row_clicked(self, current):
@@ -254,29 +1748,18 @@ class Tickets(QMainWindow):
             return
 
         if QMessageBox.question(self, "Potwierdzenie", "Czy na pewno chcesz zaktualizować ten bilet?") == QMessageBox.Yes:
-            query = QSqlQuery()
-            query.prepare("""
-                UPDATE tickets
-                SET customer_name = ?, ticket_type = ?, discount_type = ?,
-                    valid_from = ?, valid_to = ?, price = ?
-                WHERE card_id = ?
-            """)
-            
-            query.addBindValue(self.customer_name.text())
-            query.addBindValue(self.ticket_type.currentText())
-            query.addBindValue(self.ticket_discount.currentText())
-            query.addBindValue(self.valid_from.date().toString("yyyy-MM-dd"))
-            query.addBindValue(self.valid_to.date().toString("yyyy-MM-dd"))
-            query.addBindValue(float(self.price.text()))
-            query.addBindValue(self.card_id.text())
-            
-            if query.exec_():
-                QSqlDatabase.database().commit()
-                self.model.select()
-                self.clear_form()
-                QMessageBox.information(self, "Sukces", "Bilet został zaktualizowany!")
-            else:
-                QMessageBox.critical(self, "Błąd", query.lastError().text())
+            try:
+                old_record, new_record = self.store.update_ticket(
+                    self.card_id.text(), self.customer_name.text(), self.ticket_type.currentText(),
+                    self.ticket_discount.currentText(), self.valid_from.date().toString("yyyy-MM-dd"))
+            except (ValueError, RuntimeError) as e:
+                QMessageBox.critical(self, "Błąd", str(e))
+                return
+
+            self.model.update_record(old_record, new_record)
+            self.update_ticket_count()
+            self.clear_form()
+            QMessageBox.information(self, "Sukces", "Bilet został zaktualizowany!")
     
     def delete_ticket(self):
         """Usuwa wybrany bilet"""
@@ -286,10 +1769,19 @@ class Tickets(QMainWindow):
             return
             
         if QMessageBox.question(self, "Potwierdzenie", "Czy na pewno chcesz usunąć ten bilet?") == QMessageBox.Yes:
-            self.model.removeRow(current.row())
-            self.model.submitAll()
+            # Wiersz mógł zniknąć, jeśli model odświeżono w trakcie potwierdzenia
+            selected = self.model.record(current.row())
+            if selected is None:
+                self.refresh_model()
+                QMessageBox.warning(self, "Błąd", "Wybierz bilet do usunięcia!")
+                return
+            try:
+                record = self.store.delete_ticket(selected[0])
+            except (ValueError, RuntimeError) as e:
+                QMessageBox.critical(self, "Błąd", str(e))
+                return
+            self.model.remove_record(record)
             self.update_ticket_count()
-            self.model.select()
     
     def clear_form(self):
         """Czyści formularz po dodaniu lub edycji biletu"""
@@ -300,46 +1792,163 @@ class Tickets(QMainWindow):
         self.valid_from.setDate(QDate.currentDate())
 
     def export_to_CSV(self):
-        """Eksportuje dane do pliku CSV"""
-        file_name, _ = QFileDialog.getSaveFileName(self, "Eksport do CSV", "", "Pliki CSV (*.csv)")
-        if file_name:
-            with open(file_name, "w", newline="") as file:
-                writer = csv.writer(file)
-                headers = [self.model.headerData(i, Qt.Horizontal) for i in range(self.model.columnCount())]
-                writer.writerow(headers)
-                for row in range(self.model.rowCount()):
-                    row_data = [self.model.index(row, i).data() for i in range(self.model.columnCount())]
-                    writer.writerow(row_data)
-                QMessageBox.information(self, "Sukces", "Dane zostały wyeksportowane do pliku CSV!")
+        """Eksportuje dane do pliku CSV w tle, z uwzględnieniem aktywnego filtra"""
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Eksport do CSV", "", "Pliki CSV (*.csv);;Skompresowane pliki CSV (*.csv.gz)")
+        if not file_name:
+            return
+
+        self.export_worker = CsvExportWorker(
+            self.store, file_name, self.model.sources, self.model.order_by(), parent=self)
+        self.export_progress = QProgressDialog("Eksport do CSV...", "Anuluj", 0, self.model.rowCount(), self)
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.canceled.connect(self.export_worker.cancel)
+        self.export_worker.progress.connect(self.export_progress.setValue)
+        self.export_worker.completed.connect(self.on_export_completed)
+        self.export_worker.cancelled.connect(self.on_export_cancelled)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_CSV_button.setEnabled(False)
+        self.export_worker.start()
+
+    def finish_export(self):
+        """Zamyka okno postępu i zwalnia wątek eksportu"""
+        self.export_progress.canceled.disconnect(self.export_worker.cancel)
+        self.export_progress.close()
+        self.export_worker.wait()
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_CSV_button.setEnabled(True)
+
+    def on_export_completed(self, rows, rows_per_second):
+        """Informuje o zakończeniu eksportu i jego przepustowości"""
+        self.finish_export()
+        QMessageBox.information(
+            self, "Sukces",
+            f"Dane zostały wyeksportowane do pliku CSV!\n"
+            f"Wierszy: {rows} ({rows_per_second:.0f} wierszy/s)")
+
+    def on_export_cancelled(self):
+        """Informuje o przerwaniu eksportu"""
+        self.finish_export()
+        QMessageBox.information(self, "Eksport przerwany", "Eksport do CSV został anulowany.")
+
+    def on_export_failed(self, message):
+        """Informuje o błędzie eksportu"""
+        self.finish_export()
+        QMessageBox.critical(self, "Błąd", message)
+
+    def import_tickets(self):
+        """Importuje bilety z pliku CSV/JSONL w tle"""
+        file_name, _ = QFileDialog.getOpenFileName(
+            self, "Import biletów", "", "Pliki biletów (*.csv *.jsonl *.csv.gz *.jsonl.gz)")
+        if not file_name:
+            return
+
+        self.import_worker = TicketImportWorker(self.store, file_name, self)
+        self.import_progress = QProgressDialog("Import biletów...", "Anuluj", 0, 0, self)
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.canceled.connect(self.import_worker.cancel)
+        self.import_worker.progress.connect(
+            lambda rows: self.import_progress.setLabelText(f"Import biletów... {rows} wierszy"))
+        self.import_worker.completed.connect(self.on_import_completed)
+        self.import_worker.failed.connect(self.on_import_failed)
+        self.import_button.setEnabled(False)
+        self.import_worker.start()
+
+    def finish_import(self):
+        """Zamyka okno postępu, zwalnia wątek importu i odświeża tabelę"""
+        self.import_progress.canceled.disconnect(self.import_worker.cancel)
+        self.import_progress.close()
+        self.import_worker.wait()
+        self.import_worker.deleteLater()
+        self.import_worker = None
+        self.import_button.setEnabled(True)
+        self.refresh_model()
+
+    def on_import_completed(self, imported, rejected, rejects_name):
+        """Informuje o wyniku importu"""
+        self.finish_import()
+        message = f"Zaimportowano biletów: {imported}"
+        if rejected:
+            message += f"\nOdrzucono wierszy: {rejected}\nSzczegóły: {rejects_name}"
+        QMessageBox.information(self, "Import zakończony", message)
+
+    def on_import_failed(self, message):
+        """Informuje o błędzie importu"""
+        self.finish_import()
+        QMessageBox.critical(self, "Błąd", message)
+
+    def archive_tickets(self):
+        """Przenosi do archiwum bilety wygasłe dawniej niż podana liczba dni"""
+        retention_days, ok = QInputDialog.getInt(
+            self, "Archiwizacja", "Archiwizuj bilety wygasłe ponad (dni):",
+            DEFAULT_RETENTION_DAYS, 0, 3650)
+        if not ok:
+            return
+
+        self.archive_worker = ArchiveWorker(self.store, retention_days, self)
+        self.archive_progress = QProgressDialog("Archiwizacja biletów...", None, 0, 0, self)
+        self.archive_progress.setWindowModality(Qt.WindowModal)
+        self.archive_worker.progress.connect(
+            lambda rows: self.archive_progress.setLabelText(f"Archiwizacja biletów... {rows} wierszy"))
+        self.archive_worker.completed.connect(self.on_archive_completed)
+        self.archive_worker.failed.connect(self.on_archive_failed)
+        self.archive_button.setEnabled(False)
+        self.archive_worker.start()
+
+    def finish_archive(self):
+        """Zamyka okno postępu, zwalnia wątek archiwizacji i odświeża tabelę"""
+        self.archive_progress.close()
+        self.archive_worker.wait()
+        self.archive_worker.deleteLater()
+        self.archive_worker = None
+        self.archive_button.setEnabled(True)
+        self.refresh_model()
+
+    def on_archive_completed(self, moved):
+        """Informuje o wyniku archiwizacji"""
+        self.finish_archive()
+        QMessageBox.information(self, "Archiwizacja zakończona", f"Przeniesiono do archiwum biletów: {moved}")
+
+    def on_archive_failed(self, message):
+        """Informuje o błędzie archiwizacji"""
+        self.finish_archive()
+        QMessageBox.critical(self, "Błąd", message)
+
+    def filter_values(self):
+        """Zwraca (typ, rodzaj, dzień ważności) wybrane w filtrach; None oznacza wszystkie"""
+        ticket_type = self.filter_type.currentText()
+        discount_type = self.filter_discount.currentText()
+        valid_on = None
+        if self.show_valid.currentText() == "Ważne dzisiaj":
+            valid_on = datetime.now().strftime("%Y-%m-%d")
+        return (ticket_type if ticket_type != "Wszystkie" else None,
+                discount_type if discount_type != "Wszystkie" else None,
+                valid_on)
+
+    def filtered_totals(self):
+        """Zwraca (liczba, przychód) biletów spełniających filtr aktywny w modelu"""
+        ticket_type, discount_type, valid_on, search, include_archive = self.active_filter
+        if not search.strip():
+            return self.store.totals(ticket_type, discount_type, valid_on, include_archive=include_archive)
+        # Wyniki wyszukiwania są zawężone indeksem FTS, więc agregat liczony wprost
+        sql, params = union_select(ticket_sources(*self.active_filter),
+                                   "COUNT(*) AS n, TOTAL(price) AS revenue")
+        query = prepare_query(self.db, f"SELECT TOTAL(n), TOTAL(revenue) FROM ({sql})", params)
+        if query.exec_() and query.next():
+            return int(query.value(0)), float(query.value(1))
+        return 0, 0.0
 
     def apply_filters(self):
         """Filtruje dane w tabeli na podstawie wybranych kryteriów"""
-        filter_conditions = []
-        
-        if self.filter_type.currentText() != "Wszystkie":
-            filter_conditions.append(f"ticket_type = '{self.filter_type.currentText()}'")
-        
-        if self.filter_discount.currentText() != "Wszystkie":
-            filter_conditions.append(f"discount_type = '{self.filter_discount.currentText()}'")
-        
-        if self.show_valid.currentText() == "Ważne dzisiaj":
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            filter_conditions.append(
-                f"valid_from <= '{current_date}' AND valid_to >= '{current_date}'"
-            )
-
-        if filter_conditions:
-            filter_string = " AND ".join(filter_conditions)
-            self.model.setFilter(filter_string)
-        else:
-            self.model.setFilter("")
-        
-        self.model.select()
+        self.active_filter = (*self.filter_values(), self.search_input.text(),
+                              self.include_archive.isChecked())
+        self.model.set_filter(ticket_sources(*self.active_filter))
         self.update_ticket_count()
 
     def load_test_data(self):
         """Wczytuje przykładowe dane testowe do bazy danych"""
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         
         test_data = [
             # Bilety ważne (aktualna data)
@@ -384,25 +1993,118 @@ class Tickets(QMainWindow):
             if not query.exec_():
                 print(f"Błąd podczas wstawiania rekordu: {query.lastError().text()}")
         
-        QSqlDatabase.database().commit()
+        self.db.commit()
 
-def createConnection():
+def createConnection(store):
     """Tworzy połączenie z bazą danych SQLite, metoda poza klasą"""
-    con = QSqlDatabase.addDatabase("QSQLITE")
-    con.setDatabaseName("tickets.sqlite")
-    if not con.open():
+    try:
+        store.connection()
+    except RuntimeError as e:
         QMessageBox.critical(
             None,
             "Zarządzanie biletami - Błąd!",
-            "Błąd bazy danych: %s" % con.lastError().databaseText(),
+            str(e),
         )
         return False
     return True
 
+def run_parallel(store, func, items, workers):
+    """Dzieli elementy między wątki robocze; każdy używa własnego połączenia"""
+    if not items:
+        return []
+    chunks = [items[i::workers] for i in range(workers) if items[i::workers]]
+
+    def work(chunk):
+        try:
+            tune_bulk_connection(store.connection())
+            return func(chunk)
+        finally:
+            store.close_connection()
+
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        return [record for result in pool.map(work, chunks) for record in result]
+
+def run_cli(argv):
+    """Obsługuje polecenia wsadowe bez okna: wydawanie, przedłużanie, archiwizacja, raporty"""
+    parser = argparse.ArgumentParser(prog="TicketsWD.py", description="Zarządzanie biletami - tryb wsadowy")
+    parser.add_argument("--db", default="tickets.sqlite", help="plik bazy danych")
+    parser.add_argument("--query-log", help="plik JSON Lines dla wolnych zapytań; włącza pomiary zapytań")
+    parser.add_argument("--slow-ms", type=float, default=100.0, help="próg wolnego zapytania w ms")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    issue = commands.add_parser("issue", help="wydaje bilety")
+    issue.add_argument("customers", nargs="*", help="nazwy klientów")
+    issue.add_argument("--file", help="plik z nazwami klientów, jedna w wierszu")
+    issue.add_argument("--type", default="Miesięczny", choices=list(TICKET_PERIODS))
+    issue.add_argument("--discount", default="Normalny", choices=["Normalny", "Ulgowy"])
+    issue.add_argument("--from", dest="valid_from", default=date.today().isoformat())
+    issue.add_argument("--workers", type=int, default=1)
+
+    renew = commands.add_parser("renew", help="przedłuża bilety ważne dziś, które wygasają w ciągu N dni")
+    renew.add_argument("--within", type=int, default=7)
+    renew.add_argument("--workers", type=int, default=1)
+
+    report = commands.add_parser("report", help="wypisuje podsumowanie biletów")
+    report.add_argument("--date", default=date.today().isoformat())
+    report.add_argument("--include-archive", action="store_true")
+
+    archive = commands.add_parser("archive", help="przenosi wygasłe bilety do archiwum")
+    archive.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+
+    args = parser.parse_args(argv)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    if args.query_log:
+        enable_query_stats(args.slow_ms, args.query_log)
+    store = TicketStore(args.db)
+    store.migrate()
+
+    if args.command == "issue":
+        customers = list(args.customers)
+        if args.file:
+            with open(args.file, encoding="utf-8") as file:
+                customers.extend(line.strip() for line in file if line.strip())
+        requests = [(name, args.type, args.discount, args.valid_from) for name in customers]
+        started = time.perf_counter()
+        records = run_parallel(store, store.issue_tickets, requests, max(1, args.workers))
+        for record in records:
+            print(record[0], record[1])
+        print(f"Wydano biletów: {len(records)} w {time.perf_counter() - started:.2f} s", file=sys.stderr)
+    elif args.command == "renew":
+        card_ids = store.expiring_card_ids(args.within)
+        records = run_parallel(store, store.renew_tickets, card_ids, max(1, args.workers))
+        for record in records:
+            print(record[0], record[4], record[5])
+        print(f"Przedłużono biletów: {len(records)}", file=sys.stderr)
+    elif args.command == "archive":
+        started = time.perf_counter()
+        moved = store.archive_expired(args.retention_days)
+        print(f"Przeniesiono do archiwum biletów: {moved} w {time.perf_counter() - started:.2f} s",
+              file=sys.stderr)
+    elif args.command == "report":
+        count, revenue = store.totals(include_archive=args.include_archive)
+        valid_count, valid_revenue = store.totals(valid_on=args.date, include_archive=args.include_archive)
+        print(f"Liczba biletów: {count}, przychód: {revenue:.2f}")
+        print(f"Ważne {args.date}: {valid_count}, przychód: {valid_revenue:.2f}")
+        for ticket_type, discount_type, count, revenue, valid in store.breakdown(args.date,
+                                                                                 args.include_archive):
+            print(f"{ticket_type:<12} {discount_type:<10} {count:>10} {revenue:>14.2f} {valid:>10}")
+    store.close_connection()
+    if query_stats is not None:
+        print(f"{'liczba':>8} {'p50 ms':>9} {'p95 ms':>9} {'maks. ms':>9}  zapytanie", file=sys.stderr)
+        for kind, count, p50, p95, slowest, _ in query_stats.summary():
+            print(f"{count:>8} {p50:9.2f} {p95:9.2f} {slowest:9.2f}  {kind[:100]}", file=sys.stderr)
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     app = QApplication(sys.argv)
-    if not createConnection():
+    # Pomiary zapytań w oknie włączane zmiennymi środowiskowymi
+    if os.environ.get("TICKETS_QUERY_LOG"):
+        enable_query_stats(float(os.environ.get("TICKETS_SLOW_MS", "100")), os.environ["TICKETS_QUERY_LOG"])
+    store = TicketStore()
+    if not createConnection(store):
         sys.exit(1)
-    win = Tickets()
+    win = Tickets(store)
     win.show()
     sys.exit(app.exec_())
\ No newline at end of file
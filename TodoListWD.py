@@ -1,11 +1,996 @@
+import os
 import sys
-from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QListWidget, QLabel, QListWidgetItem, QInputDialog, QComboBox
-from PyQt6.QtGui import QColor
+import re
+import json
+import time
+import hashlib
+import locale
+import difflib
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QListView, QLabel, QInputDialog, QComboBox, QStyledItemDelegate, QStyle, QProgressBar, QAbstractItemView, QMessageBox
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QTimer, QThread, QEvent, QAbstractProxyModel, QSettings, QFileSystemWatcher, pyqtSignal
+from PyQt6.QtGui import QColor, QBrush
+
+PRIORITIES = ['Niski', 'Średni', 'Wysoki']
+#Jedna wspólna tabela pędzli dla wszystkich wierszy, indeksowana kodem priorytetu
+PRIORITY_BRUSHES = [QBrush(QColor('darkGreen')), QBrush(QColor('#B8860B')), QBrush(QColor('darkRed'))]
+PriorityRole = Qt.ItemDataRole.UserRole + 1
+SORT_MODES = ['Kolejność dodania', 'Priorytet, potem kolejność dodania', 'Priorytet, potem alfabetycznie']
+SORT_INSERTION, SORT_PRIORITY, SORT_ALPHABETICAL = range(len(SORT_MODES))
+
+class TaskListModel(QAbstractListModel):
+    #Nowa kolejność wierszy (i usunięte wiersze) tuż przed resetem modelu po operacji zbiorczej
+    tasksReordering = pyqtSignal(object, object)
+
+    DIFF_ROWS = 4000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        #Zadania w kolumnach: teksty i kody priorytetów (1 bajt na zadanie)
+        self.texts = []
+        self.priorities = array('B')
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.texts)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.EditRole:
+            return self.texts[index.row()]
+        if role == PriorityRole:
+            return PRIORITIES[self.priorities[index.row()]]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid():
+            return False
+        if role == Qt.ItemDataRole.EditRole:
+            self.texts[index.row()] = value
+        elif role == PriorityRole:
+            self.priorities[index.row()] = PRIORITIES.index(value)
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def addTask(self, text, priority):
+        row = len(self.texts)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.texts.append(text)
+        self.priorities.append(PRIORITIES.index(priority))
+        self.endInsertRows()
+
+    def removeTask(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.texts[row]
+        del self.priorities[row]
+        self.endRemoveRows()
+
+    def removeTasks(self, rows):
+        self.reorderTasks(keptRows(len(self.texts), rows), rows)
+
+    def moveTasks(self, rows, target):
+        self.reorderTasks(movedRows(len(self.texts), rows, target), ())
+
+    def reorderTasks(self, order, removed):
+        #Jedno przejście po kolumnach i jeden reset zamiast przesuwania listy dla każdego wiersza
+        self.tasksReordering.emit(order, removed)
+        self.beginResetModel()
+        self.texts = takeRows(self.texts, order)
+        self.priorities = takeRows(self.priorities, order)
+        self.endResetModel()
+
+    def setPriorities(self, rows, code):
+        for row in rows:
+            self.priorities[row] = code
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [PriorityRole])
+
+    def appendTasks(self, texts, priorities):
+        #Cała paczka z wątku wczytującego wchodzi jednym wstawieniem
+        self.insertTasks(len(self.texts), texts, priorities)
+
+    def insertTasks(self, row, texts, priorities):
+        self.beginInsertRows(QModelIndex(), row, row + len(texts) - 1)
+        self.texts[row:row] = texts
+        self.priorities[row:row] = priorities
+        self.endInsertRows()
+
+    def syncTasks(self, texts, priorities):
+        #Do widoku trafiają tylko różnice: wspólny początek i koniec zostają, a środek
+        #porównuje difflib (przy dużym środku wymieniany jest w całości)
+        old, new = len(self.texts), len(texts)
+        start = 0
+        while (start < min(old, new) and self.texts[start] == texts[start]
+               and self.priorities[start] == priorities[start]):
+            start += 1
+        end = 0
+        while (end < min(old, new) - start and self.texts[old - 1 - end] == texts[new - 1 - end]
+               and self.priorities[old - 1 - end] == priorities[new - 1 - end]):
+            end += 1
+        oldTasks = list(zip(self.texts[start:old - end], self.priorities[start:old - end]))
+        newTasks = list(zip(texts[start:new - end], priorities[start:new - end]))
+        if len(oldTasks) + len(newTasks) <= self.DIFF_ROWS:
+            opcodes = difflib.SequenceMatcher(None, oldTasks, newTasks, autojunk=False).get_opcodes()
+        else:
+            opcodes = [('replace', 0, len(oldTasks), 0, len(newTasks))]
+        changed = 0
+        #Od końca, żeby numery wcześniejszych wierszy pozostały aktualne
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == 'equal':
+                continue
+            first = start + i1
+            if tag == 'replace' and i2 - i1 == j2 - j1:
+                self.texts[first:start + i2] = texts[start + j1:start + j2]
+                self.priorities[first:start + i2] = priorities[start + j1:start + j2]
+                self.dataChanged.emit(self.index(first), self.index(start + i2 - 1), [])
+            else:
+                if i2 > i1:
+                    self.beginRemoveRows(QModelIndex(), first, start + i2 - 1)
+                    del self.texts[first:start + i2]
+                    del self.priorities[first:start + i2]
+                    self.endRemoveRows()
+                if j2 > j1:
+                    self.insertTasks(first, texts[start + j1:start + j2], priorities[start + j1:start + j2])
+            changed += max(i2 - i1, j2 - j1)
+        return changed
+
+    def applyOperations(self, operations):
+        if not operations:
+            return
+        self.beginResetModel()
+        for operation in operations:
+            applyOperation(self.texts, self.priorities, operation)
+        self.endResetModel()
+
+    def tasks(self):
+        for text, code in zip(self.texts, self.priorities):
+            yield text, PRIORITIES[code]
+
+class TaskFilterModel(QAbstractProxyModel):
+    #Widoczne zadania jako kubełki wierszy źródła: jeden w kolejności listy albo po jednym
+    #na priorytet (od najwyższego), w kolejności listy lub alfabetycznie. Zadania mają stałe
+    #identyfikatory, a indeksy (zbiory identyfikatorów dla priorytetów i słów) są
+    #poprawiane przy każdej zmianie źródła, więc filtr nie przegląda całej listy.
+    #Indeks słów powstaje dopiero przy pierwszym wyszukiwaniu, żeby nie spowalniać wczytywania.
+    TOKEN_PATTERN = re.compile(r'\w+')
+    RESET_ROWS = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.priority = None
+        self.words = []
+        self.sortMode = SORT_INSERTION
+        #None oznacza brak filtra i sortowania: wiersze pośrednika są wierszami źródła
+        self.buckets = None
+        self.ids = array('I')
+        self.nextId = 0
+        self.rowOf = None
+        #Teksty małymi literami w kolejności źródła, tylko w trybie alfabetycznym
+        self.sortTexts = None
+        self.priorityIds = [set() for _ in PRIORITIES]
+        self.tokenIds = None
+        self.idTokens = {}
+        #Posortowane słowa do wyszukiwania po prefiksie; usunięte słowa zostają do przebudowy
+        self.tokens = []
+        self.pendingIds = None
+
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.rowsAboutToBeInserted.connect(self.onRowsAboutToBeInserted)
+        model.rowsInserted.connect(self.onRowsInserted)
+        model.rowsAboutToBeRemoved.connect(self.onRowsAboutToBeRemoved)
+        model.rowsRemoved.connect(self.onRowsRemoved)
+        model.dataChanged.connect(self.onDataChanged)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self.onModelReset)
+        model.tasksReordering.connect(self.onTasksReordering)
+        self.rebuild()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return sum(map(len, self.buckets)) if self.buckets is not None else self.sourceModel().rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        if parent.isValid() or column != 0 or not 0 <= row < self.rowCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return QModelIndex()
+
+    def mapToSource(self, proxyIndex):
+        if not proxyIndex.isValid():
+            return QModelIndex()
+        row = proxyIndex.row()
+        if self.buckets is not None:
+            for bucket in self.buckets:
+                if row < len(bucket):
+                    row = bucket[row]
+                    break
+                row -= len(bucket)
+        return self.sourceModel().index(row, 0)
+
+    def mapFromSource(self, sourceIndex):
+        if not sourceIndex.isValid():
+            return QModelIndex()
+        row = sourceIndex.row()
+        if self.buckets is None:
+            return self.index(row)
+        number = self.bucketOf(row)
+        bucket = self.buckets[number]
+        position = self.insertPosition(bucket, row)
+        if position < len(bucket) and bucket[position] == row:
+            return self.index(self.bucketStart(number) + position)
+        return QModelIndex()
+
+    def bucketOf(self, row):
+        if self.sortMode == SORT_INSERTION:
+            return 0
+        return len(PRIORITIES) - 1 - self.sourceModel().priorities[row]
+
+    def bucketStart(self, number):
+        return sum(map(len, self.buckets[:number]))
+
+    def sortKey(self, row):
+        return self.sortTexts[row], row
+
+    def insertPosition(self, bucket, row):
+        #Wyszukiwanie binarne w kubełku według klucza bieżącego trybu
+        if self.sortMode == SORT_ALPHABETICAL:
+            return bisect_left(bucket, self.sortKey(row), key=self.sortKey)
+        return bisect_left(bucket, row)
+
+    def findRow(self, row):
+        #Położenie wiersza także wtedy, gdy jego priorytet lub tekst już się zmienił
+        for number, bucket in enumerate(self.buckets):
+            if self.sortMode == SORT_ALPHABETICAL:
+                try:
+                    return number, bucket.index(row)
+                except ValueError:
+                    continue
+            position = bisect_left(bucket, row)
+            if position < len(bucket) and bucket[position] == row:
+                return number, position
+        return None
+
+    def setFilter(self, priority, query):
+        words = self.TOKEN_PATTERN.findall(query.lower())
+        if priority == self.priority and words == self.words:
+            return
+        self.priority = priority
+        self.words = words
+        if words:
+            self.buildTokenIndex()
+        self.refresh()
+
+    def setSortMode(self, mode):
+        if mode == self.sortMode:
+            return
+        self.sortMode = mode
+        self.sortTexts = None
+        self.refresh()
+
+    def refresh(self):
+        self.beginResetModel()
+        self.buckets = self.filterRows()
+        self.endResetModel()
+
+    def filterRows(self):
+        ids = None
+        if self.priority is not None:
+            ids = self.priorityIds[self.priority]
+        for word in self.words:
+            #Ostatnie słowo bywa jeszcze niedopisane, więc każde pasuje jako prefiks
+            matches = set()
+            for position in range(bisect_left(self.tokens, word), len(self.tokens)):
+                token = self.tokens[position]
+                if not token.startswith(word):
+                    break
+                matches.update(self.tokenIds.get(token, ()))
+            ids = matches if ids is None else ids & matches
+            if not ids:
+                break
+        if ids is None:
+            if self.sortMode == SORT_INSERTION:
+                return None
+            rows = range(self.sourceModel().rowCount())
+        else:
+            if self.rowOf is None:
+                self.rowOf = {taskId: row for row, taskId in enumerate(self.ids)}
+            rows = sorted(self.rowOf[taskId] for taskId in ids)
+        buckets = self.partition(rows)
+        if self.sortMode == SORT_ALPHABETICAL:
+            if self.sortTexts is None:
+                self.sortTexts = [text.lower() for text in self.sourceModel().texts]
+            #Kubełki są w kolejności wierszy, więc stabilne sortowanie po samym tekście daje klucz (tekst, wiersz)
+            buckets = [array('I', sorted(bucket, key=self.sortTexts.__getitem__)) for bucket in buckets]
+        return buckets
+
+    def partition(self, rows):
+        #Wiersze rozdzielone na kubełki z zachowaniem ich kolejności
+        if self.sortMode == SORT_INSERTION:
+            return [array('I', rows)]
+        buckets = [array('I') for _ in PRIORITIES]
+        priorities = self.sourceModel().priorities
+        for row in rows:
+            buckets[len(PRIORITIES) - 1 - priorities[row]].append(row)
+        return buckets
+
+    def accepts(self, taskId):
+        if self.priority is not None and taskId not in self.priorityIds[self.priority]:
+            return False
+        if not self.words:
+            return True
+        tokens = self.idTokens[taskId]
+        return all(any(token.startswith(word) for token in tokens) for word in self.words)
+
+    def buildTokenIndex(self):
+        if self.tokenIds is not None:
+            return
+        self.tokenIds = {}
+        self.idTokens = {}
+        self.tokens = []
+        self.indexTokens(self.ids, 0)
+
+    def indexTasks(self, ids, first):
+        priorities = self.sourceModel().priorities
+        for offset, taskId in enumerate(ids):
+            self.priorityIds[priorities[first + offset]].add(taskId)
+        if self.tokenIds is not None:
+            self.indexTokens(ids, first)
+
+    def indexTokens(self, ids, first):
+        texts = self.sourceModel().texts
+        newTokens = []
+        for offset, taskId in enumerate(ids):
+            tokens = tuple(set(self.TOKEN_PATTERN.findall(texts[first + offset].lower())))
+            self.idTokens[taskId] = tokens
+            for token in tokens:
+                taskIds = self.tokenIds.get(token)
+                if taskIds is None:
+                    taskIds = self.tokenIds[token] = set()
+                    newTokens.append(token)
+                taskIds.add(taskId)
+        if newTokens:
+            #Słowo usunięte wcześniej może nadal być na liście
+            if len(self.tokens) + len(newTokens) > len(self.tokenIds):
+                newTokens = [token for token in newTokens if not self.hasToken(token)]
+            self.tokens.extend(newTokens)
+            self.tokens.sort()
+
+    def hasToken(self, token):
+        position = bisect_left(self.tokens, token)
+        return position < len(self.tokens) and self.tokens[position] == token
+
+    def unindexTask(self, taskId):
+        for taskIds in self.priorityIds:
+            taskIds.discard(taskId)
+        if self.tokenIds is None:
+            return
+        for token in self.idTokens.pop(taskId):
+            taskIds = self.tokenIds[token]
+            taskIds.discard(taskId)
+            if not taskIds:
+                del self.tokenIds[token]
+        if len(self.tokens) > 2 * len(self.tokenIds) + 1000:
+            self.tokens = sorted(self.tokenIds)
+
+    def rebuild(self):
+        count = self.sourceModel().rowCount()
+        self.ids = array('I', range(count))
+        self.nextId = count
+        self.rowOf = None
+        self.priorityIds = [set() for _ in PRIORITIES]
+        self.tokenIds = None
+        self.sortTexts = None
+        self.indexTasks(self.ids, 0)
+        if self.words:
+            self.buildTokenIndex()
+        self.buckets = self.filterRows()
+
+    def onTasksReordering(self, order, removed):
+        #Identyfikatory przechodzą z zadaniami, więc indeksy wymagają poprawek tylko dla usuniętych
+        for row in removed:
+            self.unindexTask(self.ids[row])
+        self.pendingIds = takeRows(self.ids, order)
+        if self.sortTexts is not None:
+            self.sortTexts = takeRows(self.sortTexts, order)
+
+    def onModelReset(self):
+        if self.pendingIds is None:
+            self.rebuild()
+        else:
+            self.ids = self.pendingIds
+            self.pendingIds = None
+            self.rowOf = None
+            self.buckets = self.filterRows()
+        self.endResetModel()
+
+    def mapSelectionRows(self, selection):
+        #Wiersze źródła dla zakresów zaznaczenia, bez tworzenia indeksu dla każdego wiersza
+        rows = []
+        for selectionRange in selection:
+            rows.extend(self.sourceRows(selectionRange.top(), selectionRange.bottom() + 1))
+        return sorted(set(rows))
+
+    def sourceRows(self, start, end):
+        if self.buckets is None:
+            return range(start, end)
+        rows = []
+        for bucket in self.buckets:
+            if start < len(bucket) and end > 0:
+                rows.extend(bucket[max(start, 0):end])
+            start -= len(bucket)
+            end -= len(bucket)
+        return rows
+
+    def shiftRows(self, bucket, start, delta):
+        if self.sortMode == SORT_ALPHABETICAL:
+            bucket[:] = array('I', (row + delta if row >= start else row for row in bucket))
+        else:
+            position = bisect_left(bucket, start)
+            bucket[position:] = array('I', (row + delta for row in bucket[position:]))
+
+    def insertVisibleRow(self, row):
+        number = self.bucketOf(row)
+        bucket = self.buckets[number]
+        position = self.insertPosition(bucket, row)
+        start = self.bucketStart(number) + position
+        self.beginInsertRows(QModelIndex(), start, start)
+        bucket.insert(position, row)
+        self.endInsertRows()
+
+    def removeVisibleRow(self, number, position):
+        start = self.bucketStart(number) + position
+        self.beginRemoveRows(QModelIndex(), start, start)
+        del self.buckets[number][position]
+        self.endRemoveRows()
+
+    def onRowsAboutToBeInserted(self, parent, first, last):
+        if self.buckets is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def onRowsInserted(self, parent, first, last):
+        count = last - first + 1
+        ids = array('I', range(self.nextId, self.nextId + count))
+        self.nextId += count
+        appended = first == len(self.ids)
+        if self.rowOf is not None and appended:
+            self.rowOf.update(zip(ids, range(first, first + count)))
+        else:
+            self.rowOf = None
+        self.ids[first:first] = ids
+        self.indexTasks(ids, first)
+        if self.sortTexts is not None:
+            self.sortTexts[first:first] = [text.lower() for text in self.sourceModel().texts[first:last + 1]]
+        if self.buckets is None:
+            self.endInsertRows()
+            return
+        if not appended:
+            for bucket in self.buckets:
+                self.shiftRows(bucket, first, count)
+        if self.priority is None and not self.words:
+            visible = range(first, last + 1)
+        else:
+            visible = [first + offset for offset, taskId in enumerate(ids) if self.accepts(taskId)]
+        if self.sortMode == SORT_ALPHABETICAL:
+            if len(visible) > self.RESET_ROWS and appended:
+                #Dopisana paczka (np. przy wczytywaniu) jest scalana z kubełkami bez liczenia kluczy od nowa
+                self.beginResetModel()
+                for number, rows in enumerate(self.partition(visible)):
+                    self.buckets[number] = array('I', sorted(self.buckets[number] + rows, key=self.sortTexts.__getitem__))
+                self.endResetModel()
+                return
+            if len(visible) > self.RESET_ROWS:
+                self.refresh()
+                return
+            for row in visible:
+                self.insertVisibleRow(row)
+            return
+        #W kolejności listy nowe wiersze tworzą w każdym kubełku jeden ciągły zakres
+        for number, rows in enumerate(self.partition(visible)):
+            if rows:
+                bucket = self.buckets[number]
+                position = bisect_left(bucket, first)
+                start = self.bucketStart(number) + position
+                self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+                bucket[position:position] = rows
+                self.endInsertRows()
+
+    def onRowsAboutToBeRemoved(self, parent, first, last):
+        for taskId in self.ids[first:last + 1]:
+            self.unindexTask(taskId)
+        if self.buckets is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        #Wpisy usuwanych wierszy znikają z widoku od razu, numery pozostałych poprawia onRowsRemoved
+        if self.sortMode == SORT_ALPHABETICAL:
+            for row in range(first, last + 1):
+                found = self.findRow(row)
+                if found is not None:
+                    self.removeVisibleRow(*found)
+            return
+        for number, bucket in enumerate(self.buckets):
+            start, end = bisect_left(bucket, first), bisect_right(bucket, last)
+            if end > start:
+                offset = self.bucketStart(number)
+                self.beginRemoveRows(QModelIndex(), offset + start, offset + end - 1)
+                del bucket[start:end]
+                self.endRemoveRows()
+
+    def onRowsRemoved(self, parent, first, last):
+        del self.ids[first:last + 1]
+        self.rowOf = None
+        if self.sortTexts is not None:
+            del self.sortTexts[first:last + 1]
+        if self.buckets is None:
+            self.endRemoveRows()
+            return
+        for bucket in self.buckets:
+            self.shiftRows(bucket, last + 1, first - last - 1)
+
+    def onDataChanged(self, topLeft, bottomRight, roles=()):
+        first, last = topLeft.row(), bottomRight.row()
+        priorities = self.sourceModel().priorities
+        priorityOnly = list(roles) == [PriorityRole]
+        for row in range(first, last + 1):
+            taskId = self.ids[row]
+            if priorityOnly:
+                taskIds = self.priorityIds[priorities[row]]
+                if taskId not in taskIds:
+                    for otherIds in self.priorityIds:
+                        otherIds.discard(taskId)
+                    taskIds.add(taskId)
+            else:
+                self.unindexTask(taskId)
+                self.indexTasks((taskId,), row)
+                if self.sortTexts is not None:
+                    self.sortTexts[row] = self.sourceModel().texts[row].lower()
+        if self.buckets is None:
+            self.dataChanged.emit(self.index(first), self.index(last), roles)
+            return
+        if last - first >= self.RESET_ROWS:
+            #Przy zmianie wielu wierszy taniej jest policzyć widok od nowa
+            self.refresh()
+            return
+        for row in range(first, last + 1):
+            found = self.findRow(row)
+            accepted = self.accepts(self.ids[row])
+            #Wiersz zostaje na miejscu, jeśli nie zmienił kubełka ani klucza sortowania
+            if (found is not None and accepted and found[0] == self.bucketOf(row)
+                    and (priorityOnly or self.sortMode != SORT_ALPHABETICAL)):
+                position = self.bucketStart(found[0]) + found[1]
+                self.dataChanged.emit(self.index(position), self.index(position), roles)
+                continue
+            #Zmiana priorytetu lub tekstu: wyjęcie z kubełka i wstawienie binarne w nowe miejsce
+            if found is not None:
+                self.removeVisibleRow(*found)
+            if accepted:
+                self.insertVisibleRow(row)
+
+def decodeTasks(data):
+    #Pliki zapisane przez starszą wersję mogą być w kodowaniu systemowym
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode(locale.getpreferredencoding(False))
+
+#W tekście zadania '\\' i '|' są poprzedzane '\\'; priorytet nigdy nie zawiera '|',
+#więc separatorem jest zawsze ostatni '|' w wierszu (także w plikach bez escapowania).
+#Odwracane są tylko te dwie sekwencje, więc inne '\\' z plików starszej wersji zostają bez zmian
+ESCAPE_PATTERN = re.compile(r'\\([\\|])')
+
+def formatTaskLine(text, priority):
+    return text.replace('\\', '\\\\').replace('|', '\\|') + '|' + priority + '\n'
+
+def parseTaskLine(line, codes):
+    text, separator, priority = line.strip().rpartition('|')
+    if not separator or priority not in codes:
+        return None
+    if '\\' in text:
+        text = ESCAPE_PATTERN.sub(r'\1', text)
+    return text, codes[priority]
+
+def parseTasks(data):
+    codes = {priority: code for code, priority in enumerate(PRIORITIES)}
+    texts = []
+    priorities = array('B')
+    skipped = 0
+    for line in decodeTasks(data).split('\n'):
+        if line.strip():
+            task = parseTaskLine(line, codes)
+            if task is None:
+                skipped += 1
+                continue
+            texts.append(task[0])
+            priorities.append(task[1])
+    return texts, priorities, skipped
+
+def keptRows(count, rows):
+    removed = set(rows)
+    return [row for row in range(count) if row not in removed]
+
+def movedRows(count, rows, target):
+    #Wybrane wiersze w dotychczasowej kolejności zaczynają się od pozycji target pozostałej listy
+    rest = keptRows(count, rows)
+    return rest[:target] + sorted(rows) + rest[target:]
+
+def takeRows(column, order):
+    if isinstance(column, array):
+        return array(column.typecode, map(column.__getitem__, order))
+    return list(map(column.__getitem__, order))
+
+def applyOperation(texts, priorities, operation):
+    kind = operation['op']
+    if kind == 'add':
+        texts.append(operation['text'])
+        priorities.append(PRIORITIES.index(operation['priority']))
+    elif kind == 'delete' and 'rows' in operation:
+        order = keptRows(len(texts), operation['rows'])
+        texts[:] = takeRows(texts, order)
+        priorities[:] = takeRows(priorities, order)
+    elif kind == 'delete':
+        del texts[operation['row']]
+        del priorities[operation['row']]
+    elif kind == 'edit':
+        texts[operation['row']] = operation['text']
+    elif kind == 'priority':
+        code = PRIORITIES.index(operation['priority'])
+        for row in operation['rows']:
+            priorities[row] = code
+    elif kind == 'move':
+        order = movedRows(len(texts), operation['rows'], operation['target'])
+        texts[:] = takeRows(texts, order)
+        priorities[:] = takeRows(priorities, order)
+    else:
+        raise ValueError(f'Nieznana operacja: {kind}')
+
+class TaskStorage(QObject):
+    #Migawka tasks.txt (format tekst|priorytet) plus dziennik operacji tasks.txt.journal.
+    #Zmiany trafiają do dziennika po chwili bezczynności, a migawka jest
+    #przepisywana w tle przez plik tymczasowy i atomową zamianę nazwy.
+    #Pliki obserwuje QFileSystemWatcher; zmianę przez inny proces rozpoznaje czas
+    #modyfikacji i rozmiar, a dla migawki dodatkowo skrót zawartości.
+    compactFinished = pyqtSignal()
+    failed = pyqtSignal(str)
+    externalChange = pyqtSignal()
+
+    DEBOUNCE_MS = 500
+    COMPACT_OPERATIONS = 1000
+    CHECK_DELAY_MS = 200
+
+    def __init__(self, fileName, model, parent=None):
+        super().__init__(parent)
+        self.fileName = fileName
+        self.journalName = fileName + '.journal'
+        self.oldJournalName = fileName + '.journal.old'
+        self.model = model
+        self.baseHash = None
+        self.pending = []
+        self.journalOperations = 0
+        self.compactThread = None
+        self.compactResult = None
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.setInterval(self.DEBOUNCE_MS)
+        self.flushTimer.timeout.connect(self.flush)
+        self.compactFinished.connect(self.finishCompaction)
+        #Stan plików po ostatnim odczycie lub własnym zapisie
+        self.diskState = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.scheduleCheck)
+        self.watcher.directoryChanged.connect(self.scheduleCheck)
+        self.checkTimer = QTimer(self)
+        self.checkTimer.setSingleShot(True)
+        self.checkTimer.setInterval(self.CHECK_DELAY_MS)
+        self.checkTimer.timeout.connect(self.checkExternalChanges)
+
+    def finishLoad(self, snapshotHash):
+        #Skrót migawki wiąże z nią dziennik; dziennik innej migawki jest nieaktualny
+        self.baseHash = snapshotHash
+        #Dziennik .old zostaje po przerwanym kompaktowaniu: jeśli migawka nie została
+        #jeszcze podmieniona, jego operacje trzeba odtworzyć, w przeciwnym razie są już w migawce
+        if self.readJournal(self.oldJournalName) is not None and not os.path.exists(self.journalName):
+            os.replace(self.oldJournalName, self.journalName)
+        elif os.path.exists(self.oldJournalName):
+            os.remove(self.oldJournalName)
+        operations = self.readJournal(self.journalName)
+        if operations is None and os.path.exists(self.journalName):
+            os.remove(self.journalName)
+        self.journalOperations = len(operations or [])
+        self.diskState = self.diskStat()
+        self.watchFiles()
+        return operations or []
+
+    def readDisk(self):
+        #Pełny stan z dysku: migawka plus pasujący do niej dziennik (albo .old w trakcie
+        #kompaktowania w innym procesie); pliki nie są przy tym zmieniane
+        state = self.diskStat()
+        try:
+            with open(self.fileName, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+        snapshotHash = hashlib.sha1(data).hexdigest()
+        texts, priorities, _ = parseTasks(data)
+        operations = self.readJournal(self.journalName, snapshotHash)
+        if operations is None:
+            operations = self.readJournal(self.oldJournalName, snapshotHash) or []
+        for operation in operations:
+            applyOperation(texts, priorities, operation)
+        return texts, priorities, (state, snapshotHash, len(operations))
+
+    def markSynced(self, diskVersion):
+        state, snapshotHash, journalOperations = diskVersion
+        self.diskState = state
+        self.baseHash = snapshotHash
+        self.journalOperations = journalOperations
+        #Dziennik innej migawki (np. po ręcznej edycji tasks.txt) jest nieaktualny, a dopisane
+        #do niego operacje zostałyby pominięte przy następnym wczytaniu
+        if self.readJournal(self.journalName) is None and os.path.exists(self.journalName):
+            os.remove(self.journalName)
+            self.diskState = self.diskStat()
+
+    def diskStat(self):
+        state = []
+        for name in (self.fileName, self.journalName):
+            try:
+                info = os.stat(name)
+                state.append((info.st_mtime_ns, info.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def externallyChanged(self):
+        state = self.diskStat()
+        if state == self.diskState:
+            return False
+        if state[1] == self.diskState[1]:
+            #Sam czas modyfikacji migawki nie przesądza o zmianie, rozstrzyga skrót zawartości
+            try:
+                with open(self.fileName, 'rb') as file:
+                    snapshotHash = hashlib.sha1(file.read()).hexdigest()
+            except FileNotFoundError:
+                snapshotHash = None
+            if snapshotHash == self.baseHash:
+                self.diskState = state
+                return False
+        return True
+
+    def watchFiles(self):
+        #Atomowa zamiana pliku usuwa go z obserwowanych, więc ścieżki są dodawane ponownie
+        paths = [os.path.dirname(os.path.abspath(self.fileName))]
+        paths += [name for name in (self.fileName, self.journalName) if os.path.exists(name)]
+        watched = set(self.watcher.files() + self.watcher.directories())
+        missing = [path for path in paths if path not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def scheduleCheck(self):
+        self.checkTimer.start()
+
+    def checkExternalChanges(self):
+        self.watchFiles()
+        #W trakcie własnego kompaktowania sprawdzenie powtarza finishCompaction
+        if self.diskState is None or self.compactThread is not None:
+            return
+        if self.externallyChanged():
+            self.externalChange.emit()
+
+    def readJournal(self, name, baseHash=None):
+        try:
+            with open(name, 'r', encoding='utf-8') as file:
+                lines = file.read().splitlines()
+        except FileNotFoundError:
+            return None
+        try:
+            if not lines or json.loads(lines[0]).get('base') != (baseHash or self.baseHash):
+                return None
+        except ValueError:
+            return None
+        operations = []
+        for line in lines[1:]:
+            try:
+                operations.append(json.loads(line))
+            except ValueError:
+                #Niepełny ostatni wiersz po awarii w trakcie zapisu
+                break
+        return operations
+
+    def record(self, operation):
+        self.pending.append(operation)
+        self.flushTimer.start()
+
+    def discardPending(self):
+        self.flushTimer.stop()
+        self.pending = []
+
+    def flush(self):
+        #W trakcie kompaktowania nowy dziennik czeka na skrót nowej migawki
+        if not self.pending or self.compactThread is not None:
+            return
+        #Zapis na pliki zmienione przez inny proces zepsułby jego zmiany; decyzję podejmuje okno
+        if self.diskState is not None and self.externallyChanged():
+            self.externalChange.emit()
+            return
+        if self.appendJournal() and self.journalOperations >= self.COMPACT_OPERATIONS:
+            self.compact()
+
+    def appendJournal(self):
+        lines = [json.dumps(operation, ensure_ascii=False) for operation in self.pending]
+        try:
+            with open(self.journalName, 'a', encoding='utf-8') as file:
+                if file.tell() == 0:
+                    lines.insert(0, json.dumps({'base': self.baseHash}))
+                file.write('\n'.join(lines) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError as e:
+            self.failed.emit(str(e))
+            return False
+        self.journalOperations += len(self.pending)
+        self.pending = []
+        self.diskState = self.diskStat()
+        self.watchFiles()
+        return True
+
+    def compact(self, background=True, force=False):
+        if self.compactThread is not None:
+            return
+        if force:
+            #Świadome nadpisanie pliku: oczekujące zmiany są już w modelu, więc trafią do migawki
+            self.flushTimer.stop()
+            self.pending = []
+        elif self.diskState is not None and self.externallyChanged():
+            self.externalChange.emit()
+            return
+        else:
+            #Bez flush(): po przekroczeniu progu sam uruchomiłby drugie kompaktowanie w tle
+            self.flushTimer.stop()
+            if self.pending:
+                self.appendJournal()
+            #Nawet niezapisane operacje są już w modelu, więc trafią do migawki
+            self.pending = []
+        if os.path.exists(self.journalName):
+            os.replace(self.journalName, self.oldJournalName)
+        #Kopia kolumn jest szybka; tekst migawki powstaje już w wątku
+        texts = list(self.model.texts)
+        priorities = array('B', self.model.priorities)
+        self.journalOperations = 0
+        if background:
+            self.compactThread = threading.Thread(target=self.writeSnapshot, args=(texts, priorities, True), daemon=True)
+            self.compactThread.start()
+        else:
+            self.writeSnapshot(texts, priorities, False)
+            self.finishCompaction()
+
+    def writeSnapshot(self, texts, priorities, notify):
+        try:
+            data = ''.join(formatTaskLine(text, PRIORITIES[code]) for text, code in zip(texts, priorities)).encode('utf-8')
+            temporaryName = self.fileName + '.tmp'
+            with open(temporaryName, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporaryName, self.fileName)
+            if os.path.exists(self.oldJournalName):
+                os.remove(self.oldJournalName)
+            self.compactResult = (hashlib.sha1(data).hexdigest(), None)
+        except OSError as e:
+            self.compactResult = (None, str(e))
+        if notify:
+            self.compactFinished.emit()
+
+    def finishCompaction(self):
+        if self.compactThread is not None:
+            self.compactThread.join()
+            self.compactThread = None
+        if self.compactResult is None:
+            return
+        snapshotHash, error = self.compactResult
+        self.compactResult = None
+        if error:
+            #Migawka nie została podmieniona, więc dotychczasowy dziennik nadal obowiązuje
+            if os.path.exists(self.oldJournalName) and not os.path.exists(self.journalName):
+                os.replace(self.oldJournalName, self.journalName)
+            self.failed.emit(error)
+        else:
+            self.baseHash = snapshotHash
+            self.diskState = self.diskStat()
+        if self.pending:
+            self.flushTimer.start()
+        self.scheduleCheck()
+
+    def close(self):
+        self.flushTimer.stop()
+        self.finishCompaction()
+        if self.pending or self.journalOperations:
+            self.compact(background=False)
+
+class TaskLoader(QThread):
+    #Czyta migawkę kawałkami i wysyła gotowe paczki zadań do wątku GUI
+    batchLoaded = pyqtSignal(object, object)
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+
+    CHUNK_BYTES = 256 * 1024
+
+    def __init__(self, fileName, parent=None):
+        super().__init__(parent)
+        self.fileName = fileName
+
+    def run(self):
+        digest = hashlib.sha1()
+        rest = b''
+        done = 0
+        skipped = 0
+        try:
+            with open(self.fileName, 'rb') as file:
+                while not self.isInterruptionRequested():
+                    chunk = file.read(self.CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    done += len(chunk)
+                    #Niedokończony ostatni wiersz czeka na następny kawałek
+                    lines = (rest + chunk).split(b'\n')
+                    rest = lines.pop()
+                    skipped += self.emitBatch(lines)
+                    self.progress.emit(done)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        if self.isInterruptionRequested():
+            return
+        skipped += self.emitBatch([rest])
+        self.completed.emit(digest.hexdigest(), skipped)
+
+    def emitBatch(self, lines):
+        texts, priorities, skipped = parseTasks(b'\n'.join(lines))
+        if texts:
+            self.batchLoaded.emit(texts, priorities)
+        return skipped
+
+class TaskDelegate(QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        #Tło z tabeli pędzli i tekst, bez tworzenia obiektów dla każdego wiersza
+        index = index.model().mapToSource(index)
+        model = index.model()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.highlightedText().color())
+        else:
+            painter.fillRect(option.rect, PRIORITY_BRUSHES[model.priorities[index.row()]])
+            painter.setPen(option.palette.text().color())
+        painter.drawText(option.rect.adjusted(4, 0, -4, 0), Qt.AlignmentFlag.AlignVCenter, model.texts[index.row()])
 
 class TaskManager(QWidget):
+    loadFinished = pyqtSignal()
+
     def __init__(self):
         super().__init__()
+        #Czasy od utworzenia okna: pierwsze odrysowanie listy i koniec wczytywania
+        self.loadStarted = time.perf_counter()
+        self.firstPaintMs = None
+        self.loadMs = None
+        self.loader = None
         self.initUI()
+        self.storage = TaskStorage('tasks.txt', self.taskModel, self)
+        self.storage.failed.connect(lambda message: self.messageLabel.setText(f'Błąd zapisu: {message}'))
+        self.storage.externalChange.connect(self.onExternalChange)
+        self.resolvingConflict = False
         self.loadTasks()
 
     def initUI(self):
@@ -16,20 +1001,46 @@ class TaskManager(QWidget):
         inputLayout = QHBoxLayout()
         buttonLayout = QHBoxLayout()
         filterLayout = QHBoxLayout()
+        countLayout = QHBoxLayout()
 
         #Widgety
         self.taskInput = QLineEdit(self)
         self.priorityInput = QComboBox(self)
-        self.priorityInput.addItems(['Niski', 'Średni', 'Wysoki'])
+        self.priorityInput.addItems(PRIORITIES)
         self.addButton = QPushButton('Dodaj zadanie', self)
-        self.deleteButton = QPushButton('Usuń zaznaczone zadanie', self)
+        self.deleteButton = QPushButton('Usuń zaznaczone zadania', self)
         self.editButton = QPushButton('Edytuj zaznaczone zadanie', self)
-        self.taskList = QListWidget(self)
+        self.priorityButton = QPushButton('Zmień priorytet zaznaczonych', self)
+        self.moveButton = QPushButton('Przenieś zaznaczone', self)
+        self.taskModel = TaskListModel(self)
+        self.filterModel = TaskFilterModel(self)
+        self.filterModel.setSourceModel(self.taskModel)
+        self.taskList = QListView(self)
+        self.taskList.setModel(self.filterModel)
+        self.taskList.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.taskList.setUniformItemSizes(True)
+        #Układ wierszy liczony porcjami w pętli zdarzeń, więc dochodzące paczki nie blokują okna
+        self.taskList.setLayoutMode(QListView.LayoutMode.Batched)
+        self.taskList.setBatchSize(2000)
+        self.taskList.setItemDelegate(TaskDelegate(self.taskList))
         self.messageLabel = QLabel('', self)
         self.taskCountLabel = QLabel('Liczba zadań: 0', self)
+        self.visibleCountLabel = QLabel('Widoczne: 0', self)
+        self.searchInput = QLineEdit(self)
+        self.searchInput.setPlaceholderText('Szukaj zadań...')
         self.filterInput = QComboBox(self)
-        self.filterInput.addItems(['Wszystkie', 'Niski', 'Średni', 'Wysoki'])
+        self.filterInput.addItems(['Wszystkie'] + PRIORITIES)
         self.filterButton = QPushButton('Filtruj', self)
+        self.sortInput = QComboBox(self)
+        self.sortInput.addItems(SORT_MODES)
+        #Tryb sortowania zapisany obok listy zadań, żeby po ponownym uruchomieniu kolejność była ta sama
+        self.settings = QSettings('tasks.ini', QSettings.Format.IniFormat, self)
+        sortMode = self.settings.value('sortMode', SORT_INSERTION, type=int)
+        if 0 <= sortMode < len(SORT_MODES):
+            self.sortInput.setCurrentIndex(sortMode)
+            self.filterModel.setSortMode(sortMode)
+        self.loadProgress = QProgressBar(self)
+        self.loadProgress.hide()
 
         #Dodanie widgetów do layoutów
         inputLayout.addWidget(self.taskInput)
@@ -37,14 +1048,21 @@ class TaskManager(QWidget):
         inputLayout.addWidget(self.addButton)
         buttonLayout.addWidget(self.deleteButton)
         buttonLayout.addWidget(self.editButton)
+        buttonLayout.addWidget(self.priorityButton)
+        buttonLayout.addWidget(self.moveButton)
+        filterLayout.addWidget(self.searchInput)
         filterLayout.addWidget(self.filterInput)
         filterLayout.addWidget(self.filterButton)
+        filterLayout.addWidget(self.sortInput)
         mainLayout.addLayout(inputLayout)
         mainLayout.addWidget(self.taskList)
         mainLayout.addLayout(buttonLayout)
         mainLayout.addLayout(filterLayout)
+        mainLayout.addWidget(self.loadProgress)
         mainLayout.addWidget(self.messageLabel)
-        mainLayout.addWidget(self.taskCountLabel)
+        countLayout.addWidget(self.taskCountLabel)
+        countLayout.addWidget(self.visibleCountLabel)
+        mainLayout.addLayout(countLayout)
         
         self.setLayout(mainLayout)
 
@@ -52,41 +1070,73 @@ class TaskManager(QWidget):
         self.addButton.clicked.connect(self.addTask)
         self.deleteButton.clicked.connect(self.deleteTask)
         self.editButton.clicked.connect(self.editTask)
+        self.priorityButton.clicked.connect(self.changePriority)
+        self.moveButton.clicked.connect(self.moveTasks)
         self.filterButton.clicked.connect(self.filterTasks)
+        self.filterInput.currentIndexChanged.connect(self.filterTasks)
+        self.searchInput.textChanged.connect(self.filterTasks)
+        self.sortInput.currentIndexChanged.connect(self.sortTasks)
 
     def addTask(self):
         task = self.taskInput.text().strip()
         priority = self.priorityInput.currentText()
         if task:
-            item = QListWidgetItem(task)
-            item.setData(1, priority)
-            self.setItemColor(item, priority)
-            self.taskList.addItem(item)
+            self.taskModel.addTask(task, priority)
+            self.storage.record({'op': 'add', 'text': task, 'priority': priority})
             self.taskInput.clear()
             self.messageLabel.setText('Dodano zadanie!')
             self.updateTaskCount()
-            self.saveTasks()
         else:
             self.messageLabel.setText('Nie można dodać pustego zadania!')
 
+    def selectedRows(self):
+        return self.filterModel.mapSelectionRows(self.taskList.selectionModel().selection())
+
     def deleteTask(self):
-        selectedTask = self.taskList.currentItem()
-        if selectedTask:
-            self.taskList.takeItem(self.taskList.row(selectedTask))
-            self.messageLabel.setText('Usunięto zadanie!')
+        #Zaznaczone zadania znikają jedną operacją modelu i jednym wpisem w dzienniku
+        rows = self.selectedRows()
+        if rows:
+            self.storage.record({'op': 'delete', 'rows': rows})
+            self.taskModel.removeTasks(rows)
+            self.messageLabel.setText('Usunięto zadanie!' if len(rows) == 1 else f'Usunięto zadania: {len(rows)}')
             self.updateTaskCount()
-            self.saveTasks()
         else:
             self.messageLabel.setText('Nie zaznaczono zadania do usunięcia!')
 
+    def changePriority(self):
+        rows = self.selectedRows()
+        if not rows:
+            self.messageLabel.setText('Nie zaznaczono zadań do zmiany priorytetu!')
+            return
+        priority, ok = QInputDialog.getItem(self, 'Zmień priorytet', 'Nowy priorytet:', PRIORITIES, editable=False)
+        if ok:
+            self.taskModel.setPriorities(rows, PRIORITIES.index(priority))
+            self.storage.record({'op': 'priority', 'rows': rows, 'priority': priority})
+            self.messageLabel.setText(f'Zmieniono priorytet zadań: {len(rows)}')
+            self.updateTaskCount()
+
+    def moveTasks(self):
+        rows = self.selectedRows()
+        if not rows:
+            self.messageLabel.setText('Nie zaznaczono zadań do przeniesienia!')
+            return
+        last = self.taskModel.rowCount() - len(rows) + 1
+        position, ok = QInputDialog.getInt(self, 'Przenieś zadania', f'Nowa pozycja (1-{last}):', 1, 1, last)
+        if ok:
+            self.storage.record({'op': 'move', 'rows': rows, 'target': position - 1})
+            self.taskModel.moveTasks(rows, position - 1)
+            self.messageLabel.setText(f'Przeniesiono zadania: {len(rows)}')
+
     def editTask(self):
-        selectedTask = self.taskList.currentItem()
-        if selectedTask:
-            text, ok = QInputDialog.getText(self, 'Edytuj zadanie', 'Zmień nazwę zadania:', text=selectedTask.text())
+        selectedTask = self.taskList.currentIndex()
+        if selectedTask.isValid():
+            text, ok = QInputDialog.getText(self, 'Edytuj zadanie', 'Zmień nazwę zadania:', text=selectedTask.data())
             if ok and text:
-                selectedTask.setText(text)
+                sourceTask = self.filterModel.mapToSource(selectedTask)
+                self.taskModel.setData(sourceTask, text)
+                self.storage.record({'op': 'edit', 'row': sourceTask.row(), 'text': text})
                 self.messageLabel.setText('Zaktualizowano zadanie!')
-                self.saveTasks()
+                self.updateTaskCount()
             else:
                 self.messageLabel.setText('Nie można ustawić pustego zadania!')
         else:
@@ -94,42 +1144,120 @@ class TaskManager(QWidget):
 
     def filterTasks(self):
         filterPriority = self.filterInput.currentText()
-        for i in range(self.taskList.count()):
-            item = self.taskList.item(i)
-            if filterPriority == 'Wszystkie' or filterPriority == item.data(1):
-                item.setHidden(False)
-            else:
-                item.setHidden(True)
+        code = PRIORITIES.index(filterPriority) if filterPriority != 'Wszystkie' else None
+        #Filtr korzysta z indeksów pośrednika zamiast ukrywać wiersze pojedynczo
+        self.filterModel.setFilter(code, self.searchInput.text())
+        self.updateTaskCount()
 
-    def setItemColor(self, item, priority):
-        if priority == 'Niski':
-            item.setBackground(QColor('darkGreen'))
-        elif priority == 'Średni':
-            item.setBackground(QColor('#B8860B'))
-        elif priority == 'Wysoki':
-            item.setBackground(QColor('darkRed'))
+    def sortTasks(self):
+        #Kolejność utrzymuje pośrednik; zmiana trybu przelicza tylko widok, plik zostaje bez zmian
+        sortMode = self.sortInput.currentIndex()
+        self.filterModel.setSortMode(sortMode)
+        self.settings.setValue('sortMode', sortMode)
 
     def updateTaskCount(self):
-        self.taskCountLabel.setText(f'Liczba zadań: {self.taskList.count()}')
+        self.taskCountLabel.setText(f'Liczba zadań: {self.taskModel.rowCount()}')
+        self.visibleCountLabel.setText(f'Widoczne: {self.filterModel.rowCount()}')
 
     def saveTasks(self):
-        with open('tasks.txt', 'w') as file:
-            for i in range(self.taskList.count()):
-                item = self.taskList.item(i)
-                file.write(f'{item.text()}|{item.data(1)}\n')
+        #Natychmiastowy zapis pełnej migawki; zwykłe zmiany idą przez dziennik
+        self.storage.compact(background=False)
 
     def loadTasks(self):
+        #Okno pokazuje się od razu, a zadania dochodzą paczkami z wątku
+        self.setEditingEnabled(False)
         try:
-            with open('tasks.txt', 'r') as file:
-                for line in file:
-                    task, priority = line.strip().split('|')
-                    item = QListWidgetItem(task)
-                    item.setData(1, priority)
-                    self.setItemColor(item, priority)
-                    self.taskList.addItem(item)
-            self.updateTaskCount()
-        except FileNotFoundError:
-            pass
+            size = os.path.getsize(self.storage.fileName)
+        except OSError:
+            size = 0
+        self.loadProgress.setRange(0, max(size, 1))
+        self.loadProgress.setValue(0)
+        self.loadProgress.setVisible(size > 0)
+        self.messageLabel.setText('Wczytywanie zadań...')
+        self.taskList.viewport().installEventFilter(self)
+        self.loader = TaskLoader(self.storage.fileName, self)
+        self.loader.batchLoaded.connect(self.onTasksLoaded)
+        self.loader.progress.connect(self.loadProgress.setValue)
+        self.loader.completed.connect(self.onLoadCompleted)
+        self.loader.failed.connect(self.onLoadFailed)
+        self.loader.start()
+
+    def onTasksLoaded(self, texts, priorities):
+        self.taskModel.appendTasks(texts, priorities)
+        self.updateTaskCount()
+
+    def onLoadCompleted(self, snapshotHash, skipped):
+        self.finishLoader()
+        self.taskModel.applyOperations(self.storage.finishLoad(snapshotHash))
+        self.updateTaskCount()
+        self.setEditingEnabled(True)
+        self.loadMs = (time.perf_counter() - self.loadStarted) * 1000
+        message = f'Wczytano {self.taskModel.rowCount()} zadań w {self.loadMs:.0f} ms'
+        if skipped:
+            message += f' (pominięto błędnych wierszy: {skipped})'
+        self.messageLabel.setText(message)
+        self.loadFinished.emit()
+
+    def onLoadFailed(self, message):
+        #Bez pełnej migawki edycja nadpisałaby plik niekompletną listą
+        self.finishLoader()
+        self.messageLabel.setText(f'Błąd odczytu: {message}')
+        self.loadFinished.emit()
+
+    def finishLoader(self):
+        self.loader.wait()
+        self.loader.deleteLater()
+        self.loader = None
+        self.loadProgress.hide()
+
+    def onExternalChange(self):
+        #Okno dialogowe uruchamia własną pętlę zdarzeń, w której może przyjść kolejne powiadomienie
+        if self.resolvingConflict:
+            return
+        self.resolvingConflict = True
+        try:
+            if self.storage.pending:
+                answer = QMessageBox.question(
+                    self, 'Konflikt zapisu',
+                    'Plik zadań zmienił inny użytkownik, a masz niezapisane zmiany.\n\n'
+                    'Tak – wczytaj zmiany z pliku (twoje niezapisane zmiany przepadną).\n'
+                    'Nie – zapisz swoją wersję (zastąpi zmiany z pliku).')
+                if answer != QMessageBox.StandardButton.Yes:
+                    self.storage.compact(background=False, force=True)
+                    self.messageLabel.setText('Zapisano twoją wersję zadań')
+                    return
+                self.storage.discardPending()
+            self.reloadTasks()
+        finally:
+            self.resolvingConflict = False
+
+    def reloadTasks(self):
+        texts, priorities, diskVersion = self.storage.readDisk()
+        changed = self.taskModel.syncTasks(texts, priorities)
+        self.storage.markSynced(diskVersion)
+        self.updateTaskCount()
+        if changed:
+            self.messageLabel.setText(f'Wczytano zmiany z pliku (zmienione wiersze: {changed})')
+
+    def setEditingEnabled(self, enabled):
+        for widget in (self.taskInput, self.addButton, self.deleteButton, self.editButton,
+                       self.priorityButton, self.moveButton, self.filterButton):
+            widget.setEnabled(enabled)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and self.firstPaintMs is None:
+            self.firstPaintMs = (time.perf_counter() - self.loadStarted) * 1000
+            watched.removeEventFilter(self)
+        return super().eventFilter(watched, event)
+
+    def closeEvent(self, event):
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader.wait()
+        #Zapis tylko po pełnym wczytaniu, inaczej migawka straciłaby resztę zadań
+        if self.loadMs is not None:
+            self.storage.close()
+        super().closeEvent(event)
 
 def darkMode(app):
     dark_style = """
@@ -161,7 +1289,7 @@ def darkMode(app):
         QPushButton:pressed {
             background-color: #333333;
         }
-        QListWidget {
+        QListView {
             background-color: #3b3b3b;
             border: 1px solid #555555;
             border-radius: 3px;
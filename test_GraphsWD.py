@@ -0,0 +1,44 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from GraphsWD import Histogram, LinearFit, PlotTab
+
+app = QApplication.instance() or QApplication([])
+
+
+def load(tab, filenames, target=None):
+    tab.start_loading(filenames, target)
+    tab.loader.wait()
+    while tab.loader is not None:
+        app.processEvents()
+
+
+def test_appended_file_matches_full_recompute(tmp_path):
+    rng = np.random.default_rng(0)
+    x = np.arange(2000, dtype=np.float64)
+    y = 3 * x + rng.normal(0, 50, len(x))
+    first, second = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    np.savetxt(first, np.column_stack([x[:1500], y[:1500]]), delimiter=",")
+    np.savetxt(second, np.column_stack([x[1500:], y[1500:]]), delimiter=",")
+
+    tab = PlotTab()
+    load(tab, [first])
+    tab.regression_check.setChecked(True)
+    tab.plot_type.setCurrentText("Histogram")
+    fit = tab.data_sets[first]["regression"]
+    load(tab, [second], target=first)
+
+    dataset = tab.data_sets[first]
+    # Momenty regresji są uzupełniane, a nie liczone od nowa
+    assert dataset["regression"] is fit and fit.count == len(x)
+    assert list(tab.data_sets) == [first]
+    assert len(dataset["data"]) == len(x)
+    full = LinearFit(dataset["data"][0].values, dataset["data"][1].values)
+    np.testing.assert_allclose(dataset["regression"].result(), full.result())
+    histogram = Histogram(*dataset["histogram"].key)
+    histogram.add(dataset["data"][1].values)
+    np.testing.assert_array_equal(dataset["histogram"].counts, histogram.counts)
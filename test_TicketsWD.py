@@ -0,0 +1,29 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication
+
+from TicketsWD import TicketStore, TicketTableModel, ticket_sources
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def test_edit_under_search_with_partial_cache(tmp_path):
+    store = TicketStore(str(tmp_path / "tickets.sqlite"))
+    store.migrate()
+    records = store.issue_tickets([(f"Jan Kowalski {n}", "Miesięczny", "Normalny", "2024-03-01")
+                                   for n in range(500)])
+    model = TicketTableModel(store.connection())
+    model.set_filter(ticket_sources(search="Kowalski"))
+    model.record(0)
+    model.record(450)
+    # Edytowany wiersz leży między stronami w pamięci podręcznej
+    assert model.rowCount() == 500 and 200 not in model._rows
+
+    old_record, new_record = store.update_ticket(records[200][0], "Jan Kowalski", "Roczny", "Normalny", "2024-03-01")
+    model.update_record(old_record, new_record)
+
+    assert model.rowCount() == 500
+    assert all(model.record(row) is not None for row in range(model.rowCount()))
+    store.close_connection()
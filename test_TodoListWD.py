@@ -0,0 +1,58 @@
+import os
+import hashlib
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from TodoListWD import PRIORITIES, TaskListModel, TaskStorage, formatTaskLine, parseTasks
+
+
+def roundTrip(data):
+    texts, priorities, skipped = parseTasks(data)
+    assert skipped == 0
+    saved = ''.join(formatTaskLine(text, PRIORITIES[code]) for text, code in zip(texts, priorities))
+    return texts, parseTasks(saved.encode('utf-8'))[0]
+
+
+def test_baseline_file_keeps_backslashes():
+    data = '\\back|Średni\nC:\\temp\\nowy|Niski\nzwykłe zadanie|Wysoki\n'.encode('utf-8')
+    texts, reloaded = roundTrip(data)
+    assert texts == ['\\back', 'C:\\temp\\nowy', 'zwykłe zadanie']
+    assert reloaded == texts
+
+
+def test_escaped_file_round_trip():
+    tasks = ['a|b', 'koniec\\', '\\|\\\\', 'x|y\\z']
+    data = ''.join(formatTaskLine(text, 'Niski') for text in tasks).encode('utf-8')
+    texts, reloaded = roundTrip(data)
+    assert texts == tasks
+    assert reloaded == tasks
+
+
+def test_close_at_compaction_threshold(tmp_path):
+    fileName = str(tmp_path / 'tasks.txt')
+    model = TaskListModel()
+    storage = TaskStorage(fileName, model)
+    storage.finishLoad(hashlib.sha1(b'').hexdigest())
+    errors = []
+    storage.failed.connect(errors.append)
+    #Zamknięcie zapisuje migawkę dokładnie raz i bez wątku w tle
+    writes = []
+    writeSnapshot = storage.writeSnapshot
+    storage.writeSnapshot = lambda texts, priorities, notify: (writes.append(notify),
+                                                               writeSnapshot(texts, priorities, notify))
+    for n in range(TaskStorage.COMPACT_OPERATIONS):
+        model.addTask(f'zadanie {n}', 'Niski')
+        storage.record({'op': 'add', 'text': f'zadanie {n}', 'priority': 'Niski'})
+        #Jedna operacja poniżej progu w dzienniku, ostatnia czeka na zapis
+        if n == TaskStorage.COMPACT_OPERATIONS - 2:
+            storage.flush()
+    storage.close()
+    assert errors == []
+    assert writes == [False]
+    assert storage.compactThread is None
+    with open(fileName, 'rb') as file:
+        data = file.read()
+    assert parseTasks(data)[0] == model.texts
+    assert storage.baseHash == hashlib.sha1(data).hexdigest()
+    assert not os.path.exists(fileName + '.tmp')
+    assert not os.path.exists(storage.journalName)